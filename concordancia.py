@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Estatísticas de concordância entre avaliadores: Kappa de Fleiss, Kappa de Cohen
+e intervalos de confiança por bootstrap.
+
+Extraído de analise_exploratoria_log.ipynb. As estatísticas são escritas como
+somas ponderadas sobre os itens: o valor observado usa peso 1 em todos eles, e
+cada réplica de bootstrap usa as multiplicidades de uma reamostragem. Assim um
+lote inteiro de réplicas é calculado com alguns produtos de matrizes, sem laços
+em Python por item ou por réplica.
+"""
+
+import numpy as np
+import pandas as pd
+
+from desempate import codificar_classes, normalizar_classes
+
+__all__ = [
+    "CATEGORIAS",
+    "contagens_por_item",
+    "fleiss_kappa",
+    "cohen_kappa",
+    "bootstrap_fleiss",
+    "bootstrap_cohen",
+    "fleiss_kappa_grupos"
+]
+
+# Categorias usadas nas classificações das frases
+CATEGORIAS = ["positiva", "negativa", "neutra"]
+
+# Réplicas de bootstrap calculadas por vez (limita a memória da matriz de pesos)
+TAMANHO_LOTE = 500
+
+def contagens_por_item(df, colunas, categorias=CATEGORIAS):
+    """
+    Matriz (itens x categorias) com quantos avaliadores deram cada categoria a cada item.
+
+    Os valores são codificados por desempate.codificar_classes; valores fora de
+    ``categorias`` (e ausentes) não são contados, de modo que o número de
+    avaliadores pode variar de um item para outro.
+    """
+    return codificar_classes(df[list(colunas)].to_numpy(dtype=object), categorias).sum(axis=1)
+
+def _fleiss_ponderado(pesos, contagens):
+    """Kappa de Fleiss de cada linha de ``pesos`` (réplicas x itens)"""
+    n = contagens.sum(axis=1)
+
+    # Apenas itens com ao menos dois avaliadores entram nos dois termos
+    validos = n >= 2
+    pesos, contagens, n = pesos[:, validos], contagens[validos], n[validos]
+
+    # P_i = (Σ n_ij² - n_i) / [n_i (n_i - 1)]
+    P_i = ((contagens ** 2).sum(axis=1) - n) / (n * (n - 1))
+    P_bar = (pesos @ P_i) / pesos.sum(axis=1)
+
+    # p_j: proporção global de cada categoria
+    p_j = (pesos @ contagens) / (pesos @ n)[:, None]
+    P_bar_e = (p_j ** 2).sum(axis=1)
+    return (P_bar - P_bar_e) / (1 - P_bar_e)
+
+def fleiss_kappa(contagens):
+    """
+    Kappa de Fleiss de uma matriz de contagens (itens x categorias), como a de
+    contagens_por_item. Aceita número de avaliadores diferente por item.
+    """
+    contagens = np.asarray(contagens)
+    return float(_fleiss_ponderado(np.ones((1, len(contagens))), contagens)[0])
+
+def _pares_cohen(a, b):
+    """
+    Codifica os pares (a, b) como a * k + b sobre as categorias observadas em ambos.
+
+    Os valores passam por desempate.normalizar_classes, e os pares com algum
+    valor ausente são descartados.
+    """
+    a, b = normalizar_classes(a), normalizar_classes(b)
+    if len(a) != len(b):
+        raise ValueError(f"As sequências têm tamanhos diferentes: {len(a)} e {len(b)}")
+    validos = (a.notna() & b.notna()).to_numpy()
+    n = int(validos.sum())
+    codigos, categorias = pd.factorize(pd.concat([a[validos], b[validos]]))
+    k = len(categorias)
+    return codigos[:n] * k + codigos[n:], k
+
+def _cohen_ponderado(pesos, pares, k):
+    """Kappa de Cohen de cada linha de ``pesos`` (réplicas x itens)"""
+    matriz = (pesos @ np.eye(k * k)[pares]).reshape(len(pesos), k, k)
+    total = matriz.sum(axis=(1, 2))
+    p_o = np.trace(matriz, axis1=1, axis2=2) / total
+    p_e = (matriz.sum(axis=2) * matriz.sum(axis=1)).sum(axis=1) / total ** 2
+    return (p_o - p_e) / (1 - p_e)
+
+def cohen_kappa(a, b):
+    """
+    Kappa de Cohen entre duas sequências de classificações dos mesmos itens,
+    ignorando os itens sem classificação em alguma delas
+    """
+    pares, k = _pares_cohen(a, b)
+    return float(_cohen_ponderado(np.ones((1, len(pares))), pares, k)[0])
+
+def _bootstrap(estatistica, n_itens, n_replicas, nivel, semente):
+    """
+    Intervalo percentil de ``estatistica(pesos)`` sobre réplicas de bootstrap.
+
+    Cada réplica é representada pelas multiplicidades dos itens em uma
+    reamostragem com reposição (uma linha multinomial), geradas em lotes.
+    """
+    rng = np.random.default_rng(semente)
+    uniforme = np.full(n_itens, 1 / n_itens)
+    replicas = []
+    for inicio in range(0, n_replicas, TAMANHO_LOTE):
+        pesos = rng.multinomial(n_itens, uniforme, size=min(TAMANHO_LOTE, n_replicas - inicio))
+        replicas.append(estatistica(pesos))
+    replicas = np.concatenate(replicas)
+    alfa = (1 - nivel) / 2
+    inferior, superior = np.nanquantile(replicas, [alfa, 1 - alfa])
+    return float(inferior), float(superior)
+
+def bootstrap_fleiss(contagens, n_replicas=2000, nivel=0.95, semente=None):
+    """
+    Kappa de Fleiss com intervalo de confiança por bootstrap dos itens.
+
+    Returns:
+        tuple: (kappa, limite inferior, limite superior)
+    """
+    contagens = np.asarray(contagens)
+    inferior, superior = _bootstrap(lambda pesos: _fleiss_ponderado(pesos, contagens),
+                                    len(contagens), n_replicas, nivel, semente)
+    return fleiss_kappa(contagens), inferior, superior
+
+def bootstrap_cohen(a, b, n_replicas=2000, nivel=0.95, semente=None):
+    """
+    Kappa de Cohen com intervalo de confiança por bootstrap dos itens.
+
+    Returns:
+        tuple: (kappa, limite inferior, limite superior)
+    """
+    pares, k = _pares_cohen(a, b)
+    inferior, superior = _bootstrap(lambda pesos: _cohen_ponderado(pesos, pares, k),
+                                    len(pares), n_replicas, nivel, semente)
+    return cohen_kappa(a, b), inferior, superior
+
+def fleiss_kappa_grupos(df, grupos, categorias=CATEGORIAS, n_replicas=0, nivel=0.95, semente=None):
+    """
+    Kappa de Fleiss de vários conjuntos de avaliadores do mesmo DataFrame.
+
+    As classificações de todas as colunas são codificadas uma única vez; a matriz
+    de contagens de cada grupo é a soma das colunas one-hot dos seus avaliadores.
+    Como antes, cada grupo usa apenas os itens sem valores ausentes nas suas colunas.
+
+    Args:
+        df (DataFrame): Classificações, uma coluna por avaliador
+        grupos (dict): Nome do grupo -> lista de colunas de avaliadores
+        categorias (list): Categorias possíveis
+        n_replicas (int): Réplicas de bootstrap por grupo (0 = sem intervalo)
+        nivel (float): Nível de confiança do intervalo
+        semente (int): Semente do gerador das réplicas
+
+    Returns:
+        DataFrame: Indexado pelo nome do grupo, com itens e kappa (e ic_inferior e
+        ic_superior quando n_replicas > 0)
+    """
+    colunas = list(dict.fromkeys(c for cols in grupos.values() for c in cols))
+    posicao = {coluna: i for i, coluna in enumerate(colunas)}
+    one_hot = codificar_classes(df[colunas].to_numpy(dtype=object), categorias)
+    ausentes = df[colunas].isna().to_numpy()
+
+    resultados = {}
+    for nome, cols in grupos.items():
+        indices = [posicao[c] for c in cols]
+        itens = ~ausentes[:, indices].any(axis=1)
+        contagens = one_hot[itens][:, indices].sum(axis=1)
+        linha = {"itens": int(itens.sum())}
+        if n_replicas:
+            linha["kappa"], linha["ic_inferior"], linha["ic_superior"] = bootstrap_fleiss(
+                contagens, n_replicas, nivel, semente)
+        else:
+            linha["kappa"] = fleiss_kappa(contagens)
+        resultados[nome] = linha
+    return pd.DataFrame.from_dict(resultados, orient="index")
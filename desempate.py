@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+Resolução de empates nas classificações por gênero (casos 2-2).
+
+Extraído de tratamento_completo_log.ipynb. Em vez de filtrar todas as
+classificações dos logs brutos a cada frase empatada, as classificações
+adicionais são indexadas uma única vez por (ItemNumber, GeneroCod), em ordem de
+Timestamp, e todos os empates são resolvidos de uma vez, em rodadas: enquanto o
+empate persistir, a próxima classificação adicional é usada no lugar da anterior.
+marcar_empates é a detecção de empates compartilhada com os notebooks de análise;
+todas as verificações de empate usam a codificação de codificar_classes.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Maioria por linha compartilhada com a montagem do painel (legado/codigo)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "legado", "codigo"))
+from trata_log_pcibex import majority_votes
+
+__all__ = [
+    "GENEROS",
+    "CLASSES",
+    "colunas_classes",
+    "normalizar_classes",
+    "codificar_classes",
+    "matriz_contagens",
+    "marcar_empates",
+    "empate_exato",
+    "indexar_classificacoes_adicionais",
+    "desempatar_em_rodadas",
+    "resolver_empates"
+]
+
+# Prefixo das colunas de cada gênero -> nome usado no relatório de desempates
+GENEROS = {"f": "feminino", "m": "masculino"}
+
+# Classificações por gênero em cada frase (f1..f4, m1..m4)
+CLASSIFICADORES = 4
+
+# Classes possíveis, na ordem das colunas de matriz_contagens
+CLASSES = ["positiva", "negativa", "neutra"]
+
+def colunas_classes(prefixo, n=CLASSIFICADORES):
+    """Colunas de classificação de um gênero: f1_class, ..., f4_class"""
+    return [f"{prefixo}{i}_class" for i in range(1, n + 1)]
+
+def normalizar_classes(valores):
+    """
+    Classificações como Series de texto sem espaços nas pontas e em minúsculas
+    (os CSVs finais trazem "neutra  " alinhado com espaços); ausentes ficam <NA>.
+    """
+    return pd.Series(np.asarray(valores, dtype=object).ravel(), dtype="string").str.strip().str.lower()
+
+def codificar_classes(valores, classes=CLASSES):
+    """
+    Classificações codificadas como (linhas x colunas x classes) booleano.
+
+    Os valores são comparados depois de normalizar_classes; valores fora de
+    ``classes`` e ausentes ficam com todas as classes falsas.
+    """
+    valores = np.asarray(valores, dtype=object)
+    linhas, colunas = valores.shape
+    normalizados = normalizar_classes(valores)
+    codigos = pd.Categorical(normalizados, categories=classes).codes.reshape(linhas, colunas)
+    return codigos[:, :, None] == np.arange(len(classes))
+
+def _empate_duplo(contagens):
+    """Empate 2-2: duas classes com duas classificações cada e nenhuma outra"""
+    return ((contagens == 2).sum(axis=1) == 2) & ((contagens > 0).sum(axis=1) == 2)
+
+def empate_exato(valores):
+    """
+    Indica, por linha de uma matriz de classificações, se há empate exato (2-2),
+    com a mesma normalização de matriz_contagens.
+    """
+    return _empate_duplo(codificar_classes(valores).sum(axis=1))
+
+def matriz_contagens(df, prefixo, n=CLASSIFICADORES):
+    """
+    Matriz one-hot somada (frases x CLASSES) das colunas de classificação de um
+    gênero, codificadas por codificar_classes.
+    """
+    return codificar_classes(df[colunas_classes(prefixo, n)].to_numpy(dtype=object)).sum(axis=1)
+
+def marcar_empates(df, prefixo, n=CLASSIFICADORES, exato=True):
+    """
+    Indica as frases empatadas nas classificações de um gênero.
+
+    Args:
+        df (DataFrame): Frases com as colunas {prefixo}1_class ... {prefixo}n_class
+        prefixo (str): "f" ou "m"
+        n (int): Número de classificadores por gênero
+        exato (bool): True marca apenas o empate 2-2 (duas classes com duas
+            classificações cada e nenhuma outra); False marca qualquer empate
+            entre as classes mais votadas (2-2, 1-1-1, 3-3, ...)
+
+    Returns:
+        Series: Booleana, com o índice de ``df``
+    """
+    contagens = matriz_contagens(df, prefixo, n)
+    if exato:
+        empate = _empate_duplo(contagens)
+    else:
+        maiores = np.sort(contagens, axis=1)[:, -2:]
+        empate = (maiores[:, 0] == maiores[:, 1]) & (maiores[:, 1] > 0)
+    return pd.Series(empate, index=df.index)
+
+def indexar_classificacoes_adicionais(todas_classificacoes, excluir=None):
+    """
+    Organiza as classificações dos logs brutos para a busca de desempates.
+
+    Args:
+        todas_classificacoes (DataFrame): Classificações com ItemNumber, GeneroCod,
+            ParticipantMD5, Classificacao, Tempo_Gasto e Timestamp
+        excluir (DataFrame): Pares (ItemNumber, ParticipantMD5) que não podem ser
+            usados no desempate, como os classificadores do painel de cada frase
+
+    Returns:
+        DataFrame: Classificações indexadas por (ItemNumber, GeneroCod), em ordem de
+        Timestamp dentro de cada par, com a posição de cada uma na coluna "ordem";
+        cada participante aparece no máximo uma vez por par
+    """
+    adicionais = todas_classificacoes
+    if excluir is not None:
+        chave = ["ItemNumber", "ParticipantMD5"]
+        excluidos = pd.MultiIndex.from_frame(excluir[chave])
+        adicionais = adicionais[~pd.MultiIndex.from_frame(adicionais[chave]).isin(excluidos)]
+    adicionais = adicionais.sort_values("Timestamp", kind="stable")
+    adicionais = adicionais.sort_values(["ItemNumber", "GeneroCod"], kind="stable")
+    # Cada participante conta uma única vez por frase e gênero, com a primeira classificação
+    adicionais = adicionais.drop_duplicates(["ItemNumber", "GeneroCod", "ParticipantMD5"])
+    adicionais = adicionais.assign(ordem=adicionais.groupby(["ItemNumber", "GeneroCod"]).cumcount())
+    return adicionais.set_index(["ItemNumber", "GeneroCod"])
+
+def desempatar_em_rodadas(classes, chaves, adicionais, max_rodadas=None):
+    """
+    Busca, para cada linha empatada, a classificação adicional que desfaz o empate.
+
+    A última coluna de ``classes`` é substituída pelas classificações adicionais da
+    mesma chave, em ordem de Timestamp, até que o empate 2-2 acabe, o conjunto de
+    adicionais se esgote ou ``max_rodadas`` sejam tentadas. Todas as linhas são
+    avaliadas juntas: cada candidato vira uma linha de um único frame.
+
+    Args:
+        classes (ndarray): Classificações (linhas x classificadores) das linhas empatadas
+        chaves (MultiIndex): (ItemNumber, GeneroCod) de cada linha
+        adicionais (DataFrame): Saída de indexar_classificacoes_adicionais
+        max_rodadas (int): Máximo de classificações adicionais por linha (None = todas)
+
+    Returns:
+        DataFrame: Indexado pela posição da linha em ``classes``, apenas para as linhas
+        com algum candidato, com a Classificacao e o Tempo_Gasto escolhidos (o
+        candidato que desfez o empate ou, se nenhum desfez, o último tentado),
+        rodadas, participantes usados, em ordem, e se houve desempate
+    """
+    consulta = pd.DataFrame({"linha": np.arange(len(classes))}, index=chaves)
+    candidatos = adicionais.join(consulta, how="inner")
+    if max_rodadas is not None:
+        candidatos = candidatos[candidatos["ordem"] < max_rodadas]
+    candidatos = candidatos.sort_values(["linha", "ordem"]).reset_index(drop=True)
+
+    # Cada candidato ocupa o lugar da última classificação da sua linha
+    linhas = candidatos["linha"].to_numpy()
+    novas = np.column_stack([classes[linhas, :-1], candidatos["Classificacao"].to_numpy(dtype=object)])
+    candidatos["desempatado"] = ~empate_exato(novas)
+
+    # Rodada escolhida: a primeira que desfaz o empate, senão a última tentada
+    ultima = candidatos.groupby("linha")["ordem"].max()
+    primeira = candidatos[candidatos["desempatado"]].groupby("linha")["ordem"].min()
+    escolhida = primeira.reindex(ultima.index).fillna(ultima).astype(int)
+
+    limite = escolhida.reindex(linhas).to_numpy()
+    usados = candidatos[candidatos["ordem"].to_numpy() <= limite]
+    resultado = (usados.drop_duplicates("linha", keep="last")
+                 .set_index("linha")[["Classificacao", "Tempo_Gasto", "desempatado"]])
+    resultado["rodadas"] = escolhida + 1
+    resultado["participantes"] = usados.groupby("linha")["ParticipantMD5"].agg(list)
+    return resultado
+
+def resolver_empates(df_original, todas_classificacoes, max_rodadas=None, excluir=None):
+    """
+    Resolve empates nas classificações, buscando classificações adicionais quando necessário.
+    Apenas considera empates quando há exatamente duas classificações com 2 ocorrências cada (2-2).
+
+    Para cada gênero, a quarta classificação das frases empatadas é substituída pelas
+    classificações adicionais (em ordem de Timestamp) da mesma frase e gênero, uma por
+    rodada, até desfazer o empate (veja desempatar_em_rodadas). max_rodadas=1 é o
+    comportamento anterior: apenas a primeira classificação adicional é tentada.
+
+    Args:
+        df_original (DataFrame): DataFrame com as classificações originais
+        todas_classificacoes (DataFrame): Todas as classificações disponíveis
+        max_rodadas (int): Máximo de classificações adicionais por frase e gênero (None = todas)
+        excluir (DataFrame): Pares (ItemNumber, ParticipantMD5) das classificações
+            que já estão no painel, que não podem desempatar a própria frase
+
+    Returns:
+        tuple: (DataFrame com empates resolvidos, DataFrame com frases desempatadas)
+    """
+    df_resolvido = df_original.copy()
+    adicionais = indexar_classificacoes_adicionais(todas_classificacoes, excluir=excluir)
+
+    frases = (df_original["frase"] if "frase" in df_original
+              else "Frase " + df_original["ItemNumber"].astype(str))
+    relatorios = []
+    for prefixo, genero in GENEROS.items():
+        colunas = colunas_classes(prefixo)
+        originais = df_original[colunas].to_numpy(dtype=object)
+        empatadas = np.flatnonzero(empate_exato(originais))
+        if not len(empatadas):
+            continue
+
+        chaves = pd.MultiIndex.from_arrays(
+            [df_original["ItemNumber"].to_numpy()[empatadas], np.full(len(empatadas), prefixo)],
+            names=["ItemNumber", "GeneroCod"]
+        )
+        escolhas = desempatar_em_rodadas(originais[empatadas], chaves, adicionais, max_rodadas)
+        if escolhas.empty:
+            continue
+
+        posicoes = empatadas[escolhas.index.to_numpy()]
+        linhas = df_resolvido.index[posicoes]
+        ultima = colunas[-1]
+        df_resolvido.loc[linhas, ultima] = escolhas["Classificacao"].to_numpy()
+        df_resolvido.loc[linhas, ultima.replace("_class", "_tempo")] = escolhas["Tempo_Gasto"].to_numpy()
+
+        # Só entram no relatório as frases em que a substituição desfez o empate
+        desempatadas = escolhas["desempatado"].to_numpy(dtype=bool)
+        posicoes = posicoes[desempatadas]
+        escolhas = escolhas[desempatadas]
+        novas = df_resolvido.loc[df_resolvido.index[posicoes], colunas].to_numpy(dtype=object)
+        relatorios.append(pd.DataFrame({
+            "posicao": posicoes,
+            "ordem_genero": list(GENEROS).index(prefixo),
+            "ItemNumber": df_original["ItemNumber"].to_numpy()[posicoes],
+            "frase": frases.to_numpy()[posicoes],
+            "genero": genero,
+            "class_originais": [str(list(c)) for c in originais[posicoes]],
+            "class_novas": [str(list(c)) for c in novas],
+            "classificacao_substituida": novas[:, -1],
+            "rodadas": escolhas["rodadas"].to_numpy(),
+            "participantes_usados": escolhas["participantes"].to_numpy()
+        }))
+    # Recalcula as classificações majoritárias após resolver os empates, como na montagem do painel
+    for prefixo, sufixo in [("f", "femi"), ("m", "masc")]:
+        maioria = majority_votes(df_resolvido[colunas_classes(prefixo)])
+        df_resolvido[f"cla_maj_{sufixo}"] = maioria["majoritaria"]
+        df_resolvido[f"qtd_maj_{sufixo}"] = maioria["quantidade"]
+
+    # Relatório na ordem das frases, feminino antes de masculino em cada uma
+    if relatorios:
+        df_desempatadas = (pd.concat(relatorios, ignore_index=True)
+                           .sort_values(["posicao", "ordem_genero"])
+                           .drop(columns=["posicao", "ordem_genero"])
+                           .reset_index(drop=True))
+    else:
+        df_desempatadas = pd.DataFrame()
+
+    return df_resolvido, df_desempatadas
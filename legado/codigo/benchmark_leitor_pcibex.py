@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark do leitor colunar (leitor_pcibex.read_log) contra a leitura original
+de process_log_file (skiprows=19, cinco filtros sobre o frame inteiro e dois merges).
+
+Uso:
+    python benchmark_leitor_pcibex.py [pasta_de_logs] [repeticoes]
+"""
+
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import pandas as pd
+
+from leitor_pcibex import read_log
+
+
+def process_log_file_original(file_path):
+    """Cópia da implementação anterior, mantida apenas como referência"""
+    df = pd.read_csv(file_path, skiprows=19, header=None)
+    df.columns = [
+        "ReceptionTime", "ParticipantMD5", "Controller", "ItemNumber", "InnerElementNumber",
+        "Label", "Group", "PennElementType", "PennElementName", "Parameter",
+        "Value", "EventTime", "Comments"
+    ]
+    df = df[~df["ReceptionTime"].astype(str).str.startswith("#")].copy()
+    df = df[~df["Label"].isin(["TCLE", "instrucoes", "agradecimento"])]
+    df.reset_index(drop=True, inplace=True)
+
+    genero_data = df[
+        (df["Label"] == "genero") &
+        (df["PennElementName"] == "selecionaGenero") &
+        (df["Parameter"] == "Selected")
+    ][["ParticipantMD5", "Value"]].rename(columns={"Value": "Genero"}).drop_duplicates()
+
+    selecoes_frases = df[
+        (df["Label"] == "frases") &
+        (df["Parameter"] == "Selection")
+    ].copy()
+    selecoes_frases["ItemNumber"] = selecoes_frases["ItemNumber"].astype(int) - 3
+    selecoes_frases = selecoes_frases[["ParticipantMD5", "ItemNumber", "Value", "EventTime"]]
+    selecoes_frases.columns = ["ParticipantMD5", "ItemNumber", "Classificacao", "Timestamp"]
+
+    start_trials = df[(df["Label"] == "frases") & (df["Parameter"] == "_Trial_") & (df["Value"] == "Start")]
+    end_trials = df[(df["Label"] == "frases") & (df["Parameter"] == "_Trial_") & (df["Value"] == "End")]
+    start_trials = start_trials[["ParticipantMD5", "ItemNumber", "EventTime"]].copy()
+    end_trials = end_trials[["ParticipantMD5", "ItemNumber", "EventTime"]].copy()
+    start_trials["ItemNumber"] = start_trials["ItemNumber"].astype(int) - 3
+    end_trials["ItemNumber"] = end_trials["ItemNumber"].astype(int) - 3
+    start_trials.rename(columns={"EventTime": "StartTime"}, inplace=True)
+    end_trials.rename(columns={"EventTime": "EndTime"}, inplace=True)
+
+    frases_final = selecoes_frases.merge(start_trials, on=["ParticipantMD5", "ItemNumber"], how="left")
+    frases_final = frases_final.merge(end_trials, on=["ParticipantMD5", "ItemNumber"], how="left")
+    frases_final["Tempo_Gasto"] = ((frases_final["EndTime"] - frases_final["StartTime"]) / 1000).round(3)
+    frases_final = frases_final[["ParticipantMD5", "ItemNumber", "Classificacao", "Tempo_Gasto", "Timestamp"]]
+
+    return frases_final, genero_data
+
+
+def process_log_file_novo(file_path):
+    log = read_log(file_path)
+    return log.selecoes, log.generos
+
+
+LEITORES = {"original": process_log_file_original, "colunar": process_log_file_novo}
+
+
+def _pico_memoria(nome, arquivos):
+    """
+    Roda em um processo novo e retorna os picos de memória (MB) da leitura:
+    o do tracemalloc, que vê Python e NumPy, e o do pool do Arrow, onde o pandas
+    guarda as colunas de texto e que o tracemalloc não enxerga
+    """
+    tracemalloc.start()
+    for arquivo in arquivos:
+        LEITORES[nome](arquivo)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    try:
+        import pyarrow
+        pico_arrow = pyarrow.default_memory_pool().max_memory()
+    except ImportError:
+        pico_arrow = 0
+    return pico / 2**20, pico_arrow / 2**20
+
+
+def medir(nome, arquivos, repeticoes):
+    """Retorna (tempo médio por rodada em segundos, picos de memória em MB)"""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for arquivo in arquivos:
+            LEITORES[nome](arquivo)
+    tempo = (time.perf_counter() - inicio) / repeticoes
+
+    # Processo novo por leitor: o pico do pool do Arrow não pode ser zerado
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        picos = executor.submit(_pico_memoria, nome, arquivos).result()
+    return tempo, picos
+
+
+def main():
+    pasta = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).resolve().parents[2] / "logs" / "logs_brutos"
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    arquivos = sorted(pasta.glob("results_prod*.csv"))
+    if not arquivos:
+        print(f"Nenhum arquivo results_prod*.csv encontrado em {pasta}")
+        return
+
+    # Confere equivalência antes de medir
+    for arquivo in arquivos:
+        frases_ori, generos_ori = process_log_file_original(arquivo)
+        frases_novo, generos_novo = process_log_file_novo(arquivo)
+        pd.testing.assert_frame_equal(frases_ori.reset_index(drop=True), frases_novo, check_dtype=False)
+        pd.testing.assert_frame_equal(generos_ori.reset_index(drop=True), generos_novo.reset_index(drop=True),
+                                      check_dtype=False)
+
+    print(f"{len(arquivos)} arquivos, {repeticoes} repetições")
+    for nome in LEITORES:
+        tempo, (pico, pico_arrow) = medir(nome, arquivos, repeticoes)
+        print(f"{nome:>9}: {tempo * 1000:8.1f} ms por rodada | "
+              f"pico de memória {pico:5.1f} MB (Python/NumPy) + {pico_arrow:5.1f} MB (Arrow)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Leitor colunar dos logs brutos do PCIbex (results_prod*.csv).
+
+Lê o cabeçalho de comentários para descobrir os nomes das colunas, carrega apenas
+as colunas usadas pelo tratamento e separa trials, seleções e gênero em uma única
+passada sobre as linhas do bloco de frases. pivot_selecoes monta, a partir das
+seleções, as matrizes frase x participante usadas nos painéis f/m.
+read_log_cached guarda o resultado da leitura em disco, para que as etapas que
+leem os mesmos logs não os interpretem de novo a cada execução.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, TextIO, Tuple
+
+import numpy as np
+import pandas as pd
+
+__all__ = [
+    'COLUNAS_PADRAO',
+    'OFFSET_ITEM',
+    'ParsedLog',
+    'pivot_selecoes',
+    'read_header',
+    'read_log',
+    'read_log_cached',
+]
+
+# Layout usado historicamente pelos scripts que pulavam 19 linhas fixas
+COLUNAS_PADRAO = [
+    "ReceptionTime", "ParticipantMD5", "Controller", "ItemNumber", "InnerElementNumber",
+    "Label", "Group", "PennElementType", "PennElementName", "Parameter",
+    "Value", "EventTime", "Comments"
+]
+
+# Descrição do cabeçalho do PCIbex -> nome de coluna usado no projeto
+_DESCRICOES = {
+    "Results reception time.": "ReceptionTime",
+    "MD5 hash of participant's IP address.": "ParticipantMD5",
+    "Controller name.": "Controller",
+    "Order number of item.": "ItemNumber",
+    "Inner element number.": "InnerElementNumber",
+    "Label.": "Label",
+    "Latin Square Group.": "Group",
+    "PennElementType.": "PennElementType",
+    "PennElementName.": "PennElementName",
+    "Parameter.": "Parameter",
+    "Value.": "Value",
+    "EventTime.": "EventTime",
+    "Comments.": "Comments",
+}
+
+_MARCADOR_COLUNAS = "# Columns below this comment are as follows:"
+
+_COLUNAS_USADAS = [
+    "ParticipantMD5", "ItemNumber", "Label", "PennElementName",
+    "Parameter", "Value", "EventTime"
+]
+
+# Deslocamento entre o ItemNumber do PCIbex e a numeração das frases
+OFFSET_ITEM = 3
+
+# Pasta do cache de read_log_cached, criada ao lado de cada log bruto
+PASTA_CACHE = "cache_leitor"
+
+# Entra na chave do cache: mudar read_log ou ParsedLog invalida as leituras guardadas
+VERSAO_CACHE = 2
+
+
+@dataclass
+class ParsedLog:
+    """Resultado da leitura de um log bruto"""
+    selecoes: pd.DataFrame  # ParticipantMD5, ItemNumber, Classificacao, Tempo_Gasto, Timestamp
+    trials: pd.DataFrame    # ParticipantMD5, ItemNumber, StartTime, EndTime, Tempo_Gasto (pares com Start ou End)
+    generos: pd.DataFrame   # ParticipantMD5, Genero
+
+
+def read_header(arquivo: TextIO) -> Tuple[List[str], int]:
+    """
+    Lê o cabeçalho de comentários até a primeira linha de dados.
+
+    O arquivo fica posicionado no início dos dados, pronto para ser passado ao
+    ``pd.read_csv``. Retorna os nomes das colunas e o número de linhas de
+    cabeçalho consumidas. Sem o bloco "Columns below this comment", assume o
+    layout padrão de 13 colunas.
+    """
+    colunas: List[str] = []
+    lendo_colunas = False
+    linhas = 0
+    while True:
+        posicao = arquivo.tell()
+        linha = arquivo.readline()
+        if not linha:
+            break
+        if not linha.startswith("#"):
+            arquivo.seek(posicao)
+            break
+        linhas += 1
+        if _MARCADOR_COLUNAS in linha:
+            lendo_colunas = True
+        elif lendo_colunas:
+            partes = linha.strip("# \r\n").split(". ", 1)
+            if len(partes) == 2 and partes[0].isdigit():
+                colunas.append(_DESCRICOES.get(partes[1], partes[1]))
+            else:
+                lendo_colunas = False
+    return (colunas or list(COLUNAS_PADRAO)), linhas
+
+
+def read_log(file_path) -> ParsedLog:
+    """Lê um log bruto do PCIbex e extrai seleções, trials e gênero"""
+    with open(file_path, "r", encoding="utf-8") as arquivo:
+        colunas, _ = read_header(arquivo)
+        faltando = [c for c in _COLUNAS_USADAS if c not in colunas]
+        if faltando:
+            raise ValueError(f"Colunas ausentes no cabeçalho de {file_path}: {faltando}")
+        df = pd.read_csv(
+            arquivo,
+            header=None,
+            names=colunas,
+            usecols=_COLUNAS_USADAS,
+            comment="#",
+            dtype={
+                "Label": "category",
+                "PennElementName": "category",
+                "Parameter": "category",
+                # Mantém o tipo que o leitor original (skiprows=19) produzia
+                "EventTime": "float64",
+            },
+        )
+
+    label = df["Label"]
+    parametro = df["Parameter"]
+
+    # === Gênero ===
+    generos = df.loc[
+        (label == "genero") &
+        (df["PennElementName"] == "selecionaGenero") &
+        (parametro == "Selected"),
+        ["ParticipantMD5", "Value"]
+    ].rename(columns={"Value": "Genero"}).drop_duplicates()
+
+    # === Bloco de frases: máscaras sobre o frame lido, copiando só as linhas usadas ===
+    # (as colunas de texto ficam no formato do pandas; converter o bloco inteiro
+    # para arrays de objetos Python custava mais memória que a leitura original)
+    no_bloco = (label == "frases").to_numpy()
+    eh_trial = no_bloco & (parametro == "_Trial_").to_numpy()
+    eh_selecao = no_bloco & (parametro == "Selection").to_numpy()
+    valores = df["Value"]
+    inicio = eh_trial & (valores == "Start").to_numpy()
+    fim = eh_trial & (valores == "End").to_numpy()
+
+    # Start/End viram colunas na linha do próprio evento; um groupby junta o trial
+    eventos = inicio | fim
+    trials = df.loc[eventos, ["ParticipantMD5", "ItemNumber"]]
+    trials["ItemNumber"] = trials["ItemNumber"].astype(int) - OFFSET_ITEM
+    tempos = df["EventTime"].to_numpy()[eventos]
+    trials["StartTime"] = np.where(inicio[eventos], tempos, np.nan)
+    trials["EndTime"] = np.where(fim[eventos], tempos, np.nan)
+    trials = trials.groupby(["ParticipantMD5", "ItemNumber"], sort=False).first()
+    trials["Tempo_Gasto"] = ((trials["EndTime"] - trials["StartTime"]) / 1000).round(3)
+
+    selecoes = df.loc[eh_selecao, ["ParticipantMD5", "ItemNumber", "Value", "EventTime"]]
+    selecoes.columns = ["ParticipantMD5", "ItemNumber", "Classificacao", "Timestamp"]
+    selecoes = selecoes.reset_index(drop=True)
+    selecoes["ItemNumber"] = selecoes["ItemNumber"].astype(int) - OFFSET_ITEM
+    chave = pd.MultiIndex.from_arrays([selecoes["ParticipantMD5"], selecoes["ItemNumber"]])
+    selecoes.insert(3, "Tempo_Gasto", trials["Tempo_Gasto"].reindex(chave).to_numpy())
+
+    return ParsedLog(
+        selecoes=selecoes,
+        trials=trials.reset_index(),
+        generos=generos,
+    )
+
+
+def read_log_cached(file_path, cache_dir=None) -> ParsedLog:
+    """
+    Igual a read_log, mas reaproveita a leitura guardada em disco.
+
+    Cada log tem uma entrada (pickle do ParsedLog) identificada pelo caminho
+    absoluto; ela só é usada se o tamanho, o mtime e VERSAO_CACHE forem os mesmos
+    da leitura guardada, caso contrário o log é lido de novo e a entrada
+    substituída. Sem ``cache_dir``, usa a pasta PASTA_CACHE ao lado do log; se
+    a entrada não puder ser gravada (pasta somente leitura), o log é devolvido
+    sem cache.
+    """
+    caminho = os.path.realpath(file_path)
+    info = os.stat(caminho)
+    chave = (VERSAO_CACHE, caminho, info.st_size, info.st_mtime_ns)
+
+    pasta = cache_dir if cache_dir is not None else os.path.join(os.path.dirname(caminho), PASTA_CACHE)
+    nome = hashlib.sha256(caminho.encode("utf-8")).hexdigest()
+    arquivo_cache = os.path.join(pasta, f"{nome}.pkl")
+    try:
+        with open(arquivo_cache, "rb") as entrada:
+            guardado = pickle.load(entrada)
+        if guardado["chave"] == chave:
+            return guardado["log"]
+    except OSError:
+        # Entrada inexistente ou pasta inacessível: o log é lido abaixo
+        pass
+    except (EOFError, KeyError, TypeError, pickle.UnpicklingError):
+        # Entrada corrompida ou de outro formato: é regravada abaixo
+        pass
+
+    log = read_log(caminho)
+
+    # Grava ao lado e renomeia, para que leituras simultâneas (processos do
+    # pool, por exemplo) nunca encontrem uma entrada pela metade. Se a pasta não
+    # aceitar escrita (um diretório de dados compartilhado), segue sem cache
+    temporario = None
+    try:
+        os.makedirs(pasta, exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=pasta, suffix=".tmp")
+        with os.fdopen(descritor, "wb") as saida:
+            pickle.dump({"chave": chave, "log": log}, saida, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, arquivo_cache)
+    except OSError as erro:
+        print(f"AVISO: cache de leitura não gravado em {pasta}: {erro}")
+    finally:
+        if temporario is not None and os.path.exists(temporario):
+            os.remove(temporario)
+    return log
+
+
+def pivot_selecoes(
+    selecoes: pd.DataFrame,
+    valores: Sequence[str] = ("Classificacao", "Tempo_Gasto"),
+    manter: Optional[str] = None,
+) -> Tuple[pd.DataFrame, ...]:
+    """
+    Pivota as seleções em uma matriz ItemNumber x ParticipantMD5 por coluna de
+    ``valores``, todas com um único ``set_index().unstack()``.
+
+    Pares (ItemNumber, ParticipantMD5) repetidos geram ValueError, a menos que
+    ``manter`` seja "first" ou "last", caso em que só essa ocorrência é usada e
+    um aviso com a contagem e exemplos dos pares é impresso.
+    """
+    chave = ["ItemNumber", "ParticipantMD5"]
+    repetidos = selecoes.duplicated(chave, keep=False)
+    if repetidos.any():
+        exemplos = selecoes.loc[repetidos, chave].drop_duplicates().head(5)
+        mensagem = (
+            f"{int(repetidos.sum())} seleções com (ItemNumber, ParticipantMD5) repetido, "
+            f"por exemplo: {list(exemplos.itertuples(index=False, name=None))}"
+        )
+        if manter is None:
+            raise ValueError(mensagem)
+        print(f"AVISO: {mensagem}; mantendo a ocorrência {manter!r} de cada par")
+        selecoes = selecoes[~selecoes.duplicated(chave, keep=manter)]
+
+    matrizes = selecoes.set_index(chave)[list(valores)].unstack("ParticipantMD5")
+    return tuple(matrizes[valor] for valor in valores)
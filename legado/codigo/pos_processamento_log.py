@@ -45,46 +45,64 @@ def processar_log_pcibex(file_path):
 
     df_trials.sort_values(by=["Participant_ID", "Timestamp"], inplace=True)
     df_classificacoes.sort_values(by=["Participant_ID", "Timestamp"], inplace=True)
+    df_classificacoes["Ordem_Classificacao"] = range(len(df_classificacoes))
 
-    registros = []
-    temp_data = {}
+    # Um trial por (participante, frase); vale o último Start e o último End, e a
+    # ordem do trial é a da primeira aparição do par nos eventos ordenados
+    chave = ["Participant_ID", "Frase_Numero"]
+    ordem = df_trials.drop_duplicates(chave)[chave]
+    ordem["Ordem_Trial"] = range(len(ordem))
+    inicios = df_trials[df_trials["Evento"] == "Start"].drop_duplicates(chave, keep="last")
+    fins = df_trials[df_trials["Evento"] == "End"].drop_duplicates(chave, keep="last")
+    trials = inicios[chave + ["Timestamp"]].rename(columns={"Timestamp": "Start_Trial"}).merge(
+        fins[chave + ["Timestamp"]].rename(columns={"Timestamp": "End_Trial"}),
+        on=chave,
+        how="inner"
+    ).merge(ordem, on=chave)
 
-    for _, row in df_trials.iterrows():
-        participant_id = row["Participant_ID"]
-        frase_num = row["Frase_Numero"]
-        evento = row["Evento"]
-        timestamp = row["Timestamp"]
-        
-        if (participant_id, frase_num) not in temp_data:
-            temp_data[(participant_id, frase_num)] = {"Start_Trial": None, "End_Trial": None, "Classificacao": None}
-        
-        if evento == "Start":
-            temp_data[(participant_id, frase_num)]["Start_Trial"] = timestamp
-        elif evento == "End":
-            temp_data[(participant_id, frase_num)]["End_Trial"] = timestamp
+    # Trials com End antes do Start não contêm nenhuma classificação
+    trials = trials[trials["Start_Trial"] <= trials["End_Trial"]]
 
-    for _, row in df_classificacoes.iterrows():
-        participant_id = row["Participant_ID"]
-        classificacao = row["Classificacao"]
-        timestamp = row["Timestamp"]
+    # Participantes com trials aninhados, sobrepostos ou que se tocam: ordenados por
+    # Start, algum trial começa antes do maior End dos anteriores
+    por_inicio = trials.sort_values(["Participant_ID", "Start_Trial"])
+    maior_fim = por_inicio.groupby("Participant_ID")["End_Trial"].cummax()
+    fim_anterior = maior_fim.groupby(por_inicio["Participant_ID"]).shift()
+    sobrepostos = por_inicio.loc[por_inicio["Start_Trial"] <= fim_anterior, "Participant_ID"].unique()
+    classificacao_sobreposta = df_classificacoes["Participant_ID"].isin(sobrepostos)
+    trial_sobreposto = trials["Participant_ID"].isin(sobrepostos)
 
-        for (p_id, frase_num), valores in temp_data.items():
-            if p_id == participant_id and valores["Start_Trial"] is not None and valores["End_Trial"] is not None:
-                if valores["Start_Trial"] <= timestamp <= valores["End_Trial"]:
-                    temp_data[(p_id, frase_num)]["Classificacao"] = classificacao
-                    break
+    # Junção por intervalo: sem sobreposição cada classificação cabe em no máximo um
+    # trial do participante, o de menor End >= Timestamp, desde que Start <= Timestamp
+    classificados = pd.merge_asof(
+        df_classificacoes[~classificacao_sobreposta].sort_values("Timestamp"),
+        trials[~trial_sobreposto].sort_values("End_Trial"),
+        left_on="Timestamp",
+        right_on="End_Trial",
+        by="Participant_ID",
+        direction="forward"
+    )
+    classificados = classificados[classificados["Start_Trial"] <= classificados["Timestamp"]]
+    classificados = classificados.astype(trials.dtypes.to_dict())
 
-    for (participant_id, frase_num), valores in temp_data.items():
-        start_trial = valores["Start_Trial"]
-        end_trial = valores["End_Trial"]
-        classificacao = valores["Classificacao"]
-        
-        if start_trial is not None and end_trial is not None and classificacao is not None:
-            tempo_gasto = round((end_trial - start_trial) / 1000, 2)
-            registros.append([participant_id, frase_num, start_trial, classificacao, end_trial, tempo_gasto])
+    # Nos participantes com sobreposição, cada classificação é cruzada com os trials
+    # que a contêm e fica com o primeiro deles na ordem acima, como no laço original
+    cruzados = df_classificacoes[classificacao_sobreposta].merge(trials[trial_sobreposto], on="Participant_ID")
+    cruzados = cruzados[cruzados["Timestamp"].between(cruzados["Start_Trial"], cruzados["End_Trial"])]
+    cruzados = cruzados.sort_values("Ordem_Trial").drop_duplicates("Ordem_Classificacao")
+    classificados = pd.concat([classificados, cruzados]).sort_values("Ordem_Classificacao")
 
-    df_final = pd.DataFrame(registros, columns=["Participant_ID", "Frase_Numero", "Start_Trial", "Classificacao", "End_Trial", "Tempo_Gasto"])
+    # Se houver mais de uma classificação no mesmo trial, vale a mais recente
+    classificados = classificados.drop_duplicates(chave, keep="last")
+
+    df_final = classificados[["Participant_ID", "Frase_Numero", "Start_Trial", "Classificacao", "End_Trial"]].copy()
+    # Segundos com duas casas, arredondando o número exato de centésimos com empate
+    # para o par. Durações terminadas em 5 ms são empates exatos: o round do Python
+    # sobre os segundos os resolvia pela representação binária (0.015 -> 0.01,
+    # 0.025 -> 0.03), aqui vão sempre para o centésimo par (0.02 nos dois casos)
+    df_final["Tempo_Gasto"] = ((df_final["End_Trial"] - df_final["Start_Trial"]) / 10).round() / 100
     df_final.sort_values(by=["Participant_ID", "Frase_Numero"], inplace=True)
+    df_final.reset_index(drop=True, inplace=True)
 
     df_final.to_csv(output_file, index=False)
     print(f"Processamento concluído! Arquivo salvo em: {output_file}")
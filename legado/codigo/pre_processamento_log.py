@@ -1,9 +1,153 @@
 #!/usr/bin/env python3
+import hashlib
 import io
-from flask import Flask, request, send_file
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from flask import Flask, Response, jsonify, request, send_file, url_for
+
+from leitor_pcibex import read_log
 
 app = Flask(__name__)
 
+# Tamanho aproximado de cada parte enviada na resposta
+TAMANHO_PARTE = 64 * 1024
+
+# Resultados do processamento completo, um CSV por SHA-256 do arquivo enviado
+PASTA_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache_processamento")
+
+# Entra no hash: mudar a saída do processamento invalida o cache antigo
+VERSAO_PROCESSAMENTO = b"1"
+
+def remover_comentarios(stream):
+    """Gera o conteúdo do stream sem as linhas que iniciam com '#', em partes de ~64 KB"""
+    parte = []
+    tamanho = 0
+    for linha in stream:
+        # Se a linha for do tipo str, codifica para bytes
+        linha = linha.encode('utf-8') if isinstance(linha, str) else linha
+        if linha.lstrip().startswith(b"#"):
+            continue
+        parte.append(linha)
+        tamanho += len(linha)
+        if tamanho >= TAMANHO_PARTE:
+            yield b"".join(parte)
+            parte = []
+            tamanho = 0
+    if parte:
+        yield b"".join(parte)
+
+def processar_log(caminho_log, caminho_saida):
+    """Extrai seleções, duração dos trials e gênero do log bruto e grava o CSV processado"""
+    log = read_log(caminho_log)
+    processado = log.selecoes.merge(log.generos, on="ParticipantMD5", how="left")
+    processado = processado[["ParticipantMD5", "Genero", "ItemNumber", "Classificacao", "Tempo_Gasto", "Timestamp"]]
+    processado.to_csv(caminho_saida, index=False)
+
+def salvar_upload(stream):
+    """
+    Copia o upload para um arquivo temporário calculando o SHA-256 no caminho.
+    Retorna o caminho do temporário e o do CSV processado correspondente no cache.
+    """
+    os.makedirs(PASTA_CACHE, exist_ok=True)
+    sha = hashlib.sha256(VERSAO_PROCESSAMENTO)
+    with tempfile.NamedTemporaryFile(dir=PASTA_CACHE, suffix=".upload", delete=False) as temporario:
+        for parte in iter(lambda: stream.read(TAMANHO_PARTE), b""):
+            sha.update(parte)
+            temporario.write(parte)
+    return temporario.name, os.path.join(PASTA_CACHE, f"{sha.hexdigest()}.csv")
+
+def gerar_resultado(caminho_upload, caminho_saida):
+    """Processa o upload salvo, se o resultado ainda não estiver no cache, e apaga o temporário"""
+    try:
+        if not os.path.exists(caminho_saida):
+            # Grava ao lado e renomeia, para que um processamento interrompido
+            # (ou simultâneo) nunca deixe um CSV pela metade no cache
+            caminho_parcial = f"{caminho_upload}.csv"
+            try:
+                processar_log(caminho_upload, caminho_parcial)
+                os.replace(caminho_parcial, caminho_saida)
+            finally:
+                if os.path.exists(caminho_parcial):
+                    os.remove(caminho_parcial)
+        return caminho_saida
+    finally:
+        os.remove(caminho_upload)
+
+def processar_com_cache(stream):
+    """Devolve o CSV processado do upload, processando apenas se ainda não estiver no cache"""
+    return gerar_resultado(*salvar_upload(stream))
+
+# === Processamento assíncrono ===
+
+# Limite de logs processados ao mesmo tempo em segundo plano
+MAX_TAREFAS = int(os.environ.get("MAX_TAREFAS", 2))
+
+# Segundos que uma tarefa concluída fica disponível para consulta e download
+TEMPO_EXPIRACAO = int(os.environ.get("TEMPO_EXPIRACAO", 3600))
+
+_executor = None
+_tarefas = {}  # id da tarefa -> Future com o caminho do CSV processado
+_conclusoes = {}  # id da tarefa -> instante (time.monotonic) em que terminou
+_tarefas_lock = threading.Lock()
+
+def _obter_executor():
+    # Criado sob demanda, para que importar o módulo não dispare processos
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=MAX_TAREFAS)
+    return _executor
+
+def _marcar_conclusao(id_tarefa):
+    """Callback do Future que registra quando a tarefa terminou"""
+    def marcar(futuro):
+        with _tarefas_lock:
+            if id_tarefa in _tarefas:
+                _conclusoes[id_tarefa] = time.monotonic()
+    return marcar
+
+def _remover_expiradas():
+    """Descarta as tarefas concluídas há mais de TEMPO_EXPIRACAO segundos (com o lock já obtido)"""
+    limite = time.monotonic() - TEMPO_EXPIRACAO
+    for id_tarefa in [i for i, concluida in _conclusoes.items() if concluida < limite]:
+        del _tarefas[id_tarefa], _conclusoes[id_tarefa]
+
+def _descartar_tarefa(id_tarefa):
+    """Remove a tarefa cujo resultado (ou erro) já foi entregue no download"""
+    with _tarefas_lock:
+        _tarefas.pop(id_tarefa, None)
+        _conclusoes.pop(id_tarefa, None)
+
+def enviar_tarefa(stream):
+    """Salva o upload e agenda o processamento no pool; retorna o id da tarefa"""
+    caminho_upload, caminho_saida = salvar_upload(stream)
+    if os.path.exists(caminho_saida):
+        # Já está no cache: a tarefa nasce concluída
+        os.remove(caminho_upload)
+        futuro = Future()
+        futuro.set_result(caminho_saida)
+    else:
+        futuro = _obter_executor().submit(gerar_resultado, caminho_upload, caminho_saida)
+    id_tarefa = uuid.uuid4().hex
+    with _tarefas_lock:
+        _remover_expiradas()
+        _tarefas[id_tarefa] = futuro
+    # Fora do lock: em um Future já concluído o callback roda na hora
+    futuro.add_done_callback(_marcar_conclusao(id_tarefa))
+    return id_tarefa
+
+def status_tarefa(futuro):
+    if futuro.running():
+        return "processando"
+    if not futuro.done():
+        return "na_fila"
+    if futuro.exception() is not None:
+        return "erro"
+    return "concluida"
+
 @app.route('/', methods=['GET', 'POST'])
 def upload_log():
     if request.method == 'POST':
@@ -16,23 +160,40 @@ def upload_log():
         if arquivo.filename == '':
             return "Nenhum arquivo selecionado.", 400
 
-        # Processa o conteúdo do arquivo, ignorando as linhas que iniciam com '#'
-        linhas_processadas = []
-        for linha in arquivo.stream:
-            # Se a linha for do tipo bytes, decodifica para string
-            linha_str = linha.decode('utf-8') if isinstance(linha, bytes) else linha
-            if linha_str.strip().startswith("#"):
-                continue
-            linhas_processadas.append(linha_str)
-
-        conteudo_processado = "".join(linhas_processadas)
-
-        # Cria um objeto BytesIO para retornar o arquivo processado
-        return send_file(
-            io.BytesIO(conteudo_processado.encode('utf-8')),
-            as_attachment=True,
-            download_name="saida_pre_processada.csv",
-            mimetype="text/plain"
+        # Processamento completo: trials, seleções, durações e gênero, com cache por hash
+        if request.form.get('modo') == 'completo':
+            try:
+                caminho_saida = processar_com_cache(arquivo.stream)
+            except (ValueError, KeyError, UnicodeDecodeError) as e:
+                return f"Não foi possível processar o log: {e}", 400
+            return send_file(
+                caminho_saida,
+                as_attachment=True,
+                download_name="saida_processada.csv",
+                mimetype="text/csv"
+            )
+
+        # Processamento assíncrono: devolve o id da tarefa e processa em segundo plano
+        if request.form.get('modo') == 'assincrono':
+            id_tarefa = enviar_tarefa(arquivo.stream)
+            return jsonify(
+                tarefa=id_tarefa,
+                status=url_for('consultar_tarefa', id_tarefa=id_tarefa)
+            ), 202
+
+        # O Flask fecha os arquivos enviados ao encerrar a requisição, antes de a resposta
+        # ser transmitida; por isso o stream é desacoplado do FileStorage e fechado pelo gerador
+        stream, arquivo.stream = arquivo.stream, io.BytesIO()
+
+        def gerar_saida():
+            with stream:
+                yield from remover_comentarios(stream)
+
+        # Devolve o arquivo em partes, à medida que é lido, sem montar a saída em memória
+        return Response(
+            gerar_saida(),
+            mimetype="text/plain",
+            headers={"Content-Disposition": "attachment; filename=saida_pre_processada.csv"}
         )
 
     # Para método GET, exibe um formulário simples para upload do arquivo.
@@ -46,11 +207,55 @@ def upload_log():
         <h1>Envie o arquivo de log para processamento</h1>
         <form method="post" enctype="multipart/form-data">
             <input type="file" name="log_file">
+            <select name="modo">
+                <option value="comentarios">Remover comentários</option>
+                <option value="completo">Processamento completo</option>
+                <option value="assincrono">Processamento completo (em segundo plano)</option>
+            </select>
             <input type="submit" value="Enviar">
         </form>
     </body>
     </html>
     '''
 
+@app.route('/tarefas/<id_tarefa>')
+def consultar_tarefa(id_tarefa):
+    """Informa o andamento de uma tarefa assíncrona e, quando concluída, onde baixar o resultado"""
+    with _tarefas_lock:
+        _remover_expiradas()
+        futuro = _tarefas.get(id_tarefa)
+    if futuro is None:
+        return jsonify(erro="Tarefa não encontrada."), 404
+
+    status = status_tarefa(futuro)
+    resposta = {"tarefa": id_tarefa, "status": status}
+    if status == "erro":
+        resposta["erro"] = str(futuro.exception())
+    elif status == "concluida":
+        resposta["resultado"] = url_for('baixar_resultado', id_tarefa=id_tarefa)
+    return jsonify(resposta)
+
+@app.route('/tarefas/<id_tarefa>/resultado')
+def baixar_resultado(id_tarefa):
+    """Entrega o resultado (ou o erro) de uma tarefa concluída e a descarta em seguida"""
+    with _tarefas_lock:
+        _remover_expiradas()
+        futuro = _tarefas.get(id_tarefa)
+    if futuro is None:
+        return "Tarefa não encontrada.", 404
+    status = status_tarefa(futuro)
+    if status in ("na_fila", "processando"):
+        return "Resultado ainda não disponível.", 409
+    # O CSV continua no cache por hash; só a entrada da tarefa deixa de existir
+    _descartar_tarefa(id_tarefa)
+    if status == "erro":
+        return f"Não foi possível processar o log: {futuro.exception()}", 500
+    return send_file(
+        futuro.result(),
+        as_attachment=True,
+        download_name="saida_processada.csv",
+        mimetype="text/csv"
+    )
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -1,24 +1,15 @@
 import pandas as pd
 import os
 
+from leitor_pcibex import read_header
+
 def process_file(file_path):
     try:
+        # Header block is parsed up to the first data line; the same open file
+        # is then handed to read_csv, so the export is read only once
         with open(file_path, "r", encoding="utf-8") as file:
-            lines = file.readlines()
-        
-        column_names = []
-        data_start_index = 0
-        for i, line in enumerate(lines):
-            if "# Columns below this comment are as follows:" in line:
-                data_start_index = i + 1
-            elif data_start_index and line.startswith("#"):
-                parts = line.strip("# \n").split(". ", 1)
-                if len(parts) == 2:
-                    column_names.append(parts[1])
-            elif data_start_index and not line.startswith("#"):
-                break
-        
-        df = pd.read_csv(file_path, comment="#", header=None)
+            column_names, _ = read_header(file)
+            df = pd.read_csv(file, comment="#", header=None)
         num_columns = df.shape[1]
         num_detected_columns = len(column_names)
         
@@ -30,7 +21,7 @@ def process_file(file_path):
         df.columns = column_names
         
         # Ensure required columns exist
-        required_columns = [1, 3, 5, 10, 11]
+        required_columns = [1, 3, 5, 9, 10, 11]
         if any(i >= len(column_names) for i in required_columns):
             print("Error: Required columns not found in the file.")
             return None
@@ -39,26 +30,34 @@ def process_file(file_path):
             column_names[1],  # Participante
             column_names[3],  # Ordem (Order number of item)
             column_names[5],  # Tipo
+            column_names[9],  # Parâmetro (_Trial_ / Selection)
             column_names[10], # Valor
             column_names[11]  # Tempo
         ]
         df_selected = df[selected_columns]
-        df_selected.columns = ["Participante", "Ordem", "Tipo", "Valor", "Tempo"]
+        df_selected.columns = ["Participante", "Ordem", "Tipo", "Parametro", "Valor", "Tempo"]
         
         # Filter only 'frases' records
-        df_selected = df_selected[df_selected["Tipo"] == "frases"].reset_index(drop=True)
+        df_selected = df_selected[df_selected["Tipo"] == "frases"]
+        
+        # Rebuild each trial by (participant, item) instead of assuming that rows come
+        # in Start/Selection/End triplets: each event type becomes its own column and
+        # a single groupby joins the events of the same trial
+        eh_trial = df_selected["Parametro"] == "_Trial_"
+        eventos = pd.DataFrame({
+            "Participante": df_selected["Participante"],
+            "Ordem": df_selected["Ordem"] - 3,
+            "Inicio": df_selected["Tempo"].where(eh_trial & (df_selected["Valor"] == "Start")),
+            "Fim": df_selected["Tempo"].where(eh_trial & (df_selected["Valor"] == "End")),
+            "Classificação": df_selected["Valor"].where(df_selected["Parametro"] == "Selection"),
+        })
+        trials = eventos.groupby(["Participante", "Ordem"], sort=False).first()
         
-        # Summarize every 3 records into 1
-        grouped_data = []
-        for i in range(0, len(df_selected), 3):
-            if i + 2 < len(df_selected):
-                participante = df_selected.loc[i, "Participante"]
-                ordem = df_selected.loc[i, "Ordem"] - 3
-                classificacao = df_selected.loc[i + 1, "Valor"]
-                tempo_gasto = round((df_selected.loc[i + 2, "Tempo"] - df_selected.loc[i, "Tempo"]) / 1000, 2)
-                grouped_data.append([participante, ordem, classificacao, tempo_gasto])
+        # Trials without a selection are dropped; a missing Start or End leaves the time empty
+        trials = trials.dropna(subset=["Classificação"])
+        trials["Tempo Gasto"] = ((trials["Fim"] - trials["Inicio"]) / 1000).round(2)
         
-        df_final = pd.DataFrame(grouped_data, columns=["Participante", "Ordem", "Classificação", "Tempo Gasto"])
+        df_final = trials.reset_index()[["Participante", "Ordem", "Classificação", "Tempo Gasto"]]
         
         output_file_path = file_path.replace(".csv", "_limpo.csv")
         df_final.to_csv(output_file_path, index=False)
@@ -1,169 +1,194 @@
 # -*- coding: utf-8 -*-
 
 
+import numpy as np
 import pandas as pd
-from collections import Counter
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from leitor_pcibex import pivot_selecoes, read_log_cached
 
 def process_log_file(file_path):
-    # === 1. Read CSV file ===
-    df = pd.read_csv(file_path, skiprows=19, header=None)
-    df.columns = [
-        "ReceptionTime", "ParticipantMD5", "Controller", "ItemNumber", "InnerElementNumber",
-        "Label", "Group", "PennElementType", "PennElementName", "Parameter",
-        "Value", "EventTime", "Comments"
-    ]
-    df = df[~df["ReceptionTime"].astype(str).str.startswith("#")].copy()
-    df = df[~df["Label"].isin(["TCLE", "instrucoes", "agradecimento"])]
-    df.reset_index(drop=True, inplace=True)
-
-    # === 2. Extract gender data ===
-    genero_data = df[
-        (df["Label"] == "genero") &
-        (df["PennElementName"] == "selecionaGenero") &
-        (df["Parameter"] == "Selected")
-    ][["ParticipantMD5", "Value"]].rename(columns={"Value": "Genero"}).drop_duplicates()
-
-    # === 3. Process sentence block ===
-    selecoes_frases = df[
-        (df["Label"] == "frases") &
-        (df["Parameter"] == "Selection")
-    ].copy()
-    selecoes_frases["ItemNumber"] = selecoes_frases["ItemNumber"].astype(int) - 3
-    selecoes_frases = selecoes_frases[["ParticipantMD5", "ItemNumber", "Value", "EventTime"]]
-    selecoes_frases.columns = ["ParticipantMD5", "ItemNumber", "Classificacao", "Timestamp"]
-
-    # Get start and end times
-    start_trials = df[(df["Label"] == "frases") & (df["Parameter"] == "_Trial_") & (df["Value"] == "Start")]
-    end_trials = df[(df["Label"] == "frases") & (df["Parameter"] == "_Trial_") & (df["Value"] == "End")]
-    start_trials = start_trials[["ParticipantMD5", "ItemNumber", "EventTime"]].copy()
-    end_trials = end_trials[["ParticipantMD5", "ItemNumber", "EventTime"]].copy()
-    start_trials["ItemNumber"] = start_trials["ItemNumber"].astype(int) - 3
-    end_trials["ItemNumber"] = end_trials["ItemNumber"].astype(int) - 3
-    start_trials.rename(columns={"EventTime": "StartTime"}, inplace=True)
-    end_trials.rename(columns={"EventTime": "EndTime"}, inplace=True)
-
-    # Calculate time spent
-    frases_final = selecoes_frases.merge(start_trials, on=["ParticipantMD5", "ItemNumber"], how="left")
-    frases_final = frases_final.merge(end_trials, on=["ParticipantMD5", "ItemNumber"], how="left")
-    frases_final["Tempo_Gasto"] = ((frases_final["EndTime"] - frases_final["StartTime"]) / 1000).round(3)
-    frases_final = frases_final[["ParticipantMD5", "ItemNumber", "Classificacao", "Tempo_Gasto", "Timestamp"]]
+    # Single-pass columnar read (see leitor_pcibex.read_log), reused from the
+    # on-disk cache while the raw file is unchanged
+    log = read_log_cached(file_path)
+    return log.selecoes, log.generos
+
+def majority_votes(classes):
+    """
+    Majority class of each row over the rater columns in `classes`, vectorized.
+
+    Values are factorized into a code matrix and counted per row with a single
+    bincount. As with Counter.most_common, a tie goes to the value that appears
+    first in column order. Returns a frame with the columns `majoritaria`
+    (missing when the row has no answers), `quantidade` (raters agreeing with it)
+    and `empate` (True when another class has the same count).
+    """
+    valores = classes.to_numpy(dtype=object)
+    n_linhas, n_colunas = valores.shape
+
+    # Code 0 is reserved for missing answers, classes start at 1
+    codigos, _ = pd.factorize(valores.ravel())
+    codigos = (codigos + 1).reshape(n_linhas, n_colunas)
+    n_codigos = codigos.max(initial=0) + 1
+
+    # Per-row histogram: offset each row into its own slice of a flat bincount
+    deslocados = codigos + (np.arange(n_linhas) * n_codigos)[:, None]
+    contagens = np.bincount(deslocados.ravel(), minlength=n_linhas * n_codigos).reshape(n_linhas, n_codigos)
+    contagens[:, 0] = 0
+
+    quantidade = contagens.max(axis=1)
+    empate = (contagens == quantidade[:, None]).sum(axis=1) > 1
+    tem_resposta = quantidade > 0
+
+    # First column (in rater order) holding a value with the majority count
+    contagem_celula = np.take_along_axis(contagens, codigos, axis=1)
+    coluna = ((contagem_celula == quantidade[:, None]) & (codigos > 0)).argmax(axis=1)
+    majoritaria = valores[np.arange(n_linhas), coluna]
+    majoritaria[~tem_resposta] = None
+
+    return pd.DataFrame({
+        "majoritaria": majoritaria,
+        "quantidade": quantidade,
+        "empate": empate & tem_resposta,
+    }, index=classes.index)
+
+def list_log_files(log_folder, base_filename="results_prod"):
+    """Lists every raw log in the folder in file order: base, (1), (2), ..."""
+    pattern = re.compile(rf"^{re.escape(base_filename)}(?: \((\d+)\))?\.csv$")
+    numbered = []
+    for filename in os.listdir(log_folder):
+        match = pattern.match(filename)
+        if match:
+            numbered.append((int(match.group(1) or 0), filename))
+    return [os.path.join(log_folder, filename) for _, filename in sorted(numbered)]
+
+def panel_columns(n_raters=4):
+    """Output column order of the panel for n raters per gender"""
+    raters = range(1, n_raters + 1)
+    return (
+        ["ItemNumber",
+         # Majorities and quantities
+         "cla_maj_femi", "qtd_maj_femi",
+         "cla_maj_masc", "qtd_maj_masc"]
+        # All female classifications together, then all male ones
+        + [f"f{i}_class" for i in raters] + [f"m{i}_class" for i in raters]
+        # All time columns
+        + [f"f{i}_tempo" for i in raters] + [f"m{i}_tempo" for i in raters]
+    )
+
+def gender_codes(generos):
+    """Encodes each participant's Genero answer as "m" (masculino) or "f" (anything else)"""
+    return generos["Genero"].str.lower().map(lambda g: "m" if "masculino" in g else "f")
+
+def panel_raters(generos, n_raters=4):
+    """
+    ParticipantMD5s that make up the panel: the first n_raters participants of
+    each gender (females first), in generos order. `generos` needs GeneroCod.
+    """
+    generos = generos.drop_duplicates("ParticipantMD5")
+    ids_femininos = generos[generos["GeneroCod"] == "f"].head(n_raters)["ParticipantMD5"].tolist()
+    ids_masculinos = generos[generos["GeneroCod"] == "m"].head(n_raters)["ParticipantMD5"].tolist()
+    return ids_femininos + ids_masculinos
+
+def build_panel(frases, generos, n_raters=4, manter="first"):
+    """
+    Pivots the classifications and times of the panel_raters participants into
+    one row per ItemNumber, with columns f1..fN / m1..mN.
+    Raters of a gender are numbered in pivot (ParticipantMD5) order; a gender
+    with fewer than n_raters participants gets empty columns. A repeated
+    (ItemNumber, ParticipantMD5) pair keeps its first answer, as pivot_table's
+    aggfunc="first" did, and is reported with an AVISO line; pass manter="last",
+    or None to raise instead (see leitor_pcibex.pivot_selecoes).
+    """
+    generos = generos.drop_duplicates("ParticipantMD5")
+    genero_por_participante = dict(zip(generos["ParticipantMD5"], generos["GeneroCod"]))
+
+    frases_filtradas = frases[frases["ParticipantMD5"].isin(panel_raters(generos, n_raters))]
+
+    # Class and time matrices from a single pivot
+    pivot_class, pivot_time = pivot_selecoes(frases_filtradas, manter=manter)
+
+    # Rename columns to generic identifiers
+    rename_dict_class = {}
+    rename_dict_time = {}
+    for prefixo in ["f", "m"]:
+        colunas = [col for col in pivot_class.columns if genero_por_participante[col] == prefixo]
+        for i, col in enumerate(colunas[:n_raters], 1):
+            rename_dict_class[col] = f"{prefixo}{i}_class"
+            rename_dict_time[col] = f"{prefixo}{i}_tempo"
+
+    pivot_class = pivot_class.rename(columns=rename_dict_class)
+    pivot_time = pivot_time.rename(columns=rename_dict_time)
     
-    return frases_final, genero_data
+    frases_limitadas = pd.concat([pivot_class, pivot_time], axis=1).reset_index()
+
+    # Calculate majority classifications
+    for prefixo, sufixo in [("f", "femi"), ("m", "masc")]:
+        colunas = [f"{prefixo}{i}_class" for i in range(1, n_raters + 1)]
+        maioria = majority_votes(frases_limitadas.reindex(columns=colunas))
+        frases_limitadas[f"cla_maj_{sufixo}"] = maioria["majoritaria"]
+        frases_limitadas[f"qtd_maj_{sufixo}"] = maioria["quantidade"]
+
+    return frases_limitadas.reindex(columns=panel_columns(n_raters))
+
+def process_file(file_path, n_raters=4, manter="first"):
+    """
+    Builds the f/m panel of a single raw log, with ItemNumber relative to the file.
+    Returns the formatted frame, the highest ItemNumber seen, used as the offset
+    of the next file, and the ParticipantMD5s of the panel (see panel_raters).
+    """
+    frases, generos = process_log_file(file_path)
+    generos["GeneroCod"] = gender_codes(generos)
+    panel = build_panel(frases, generos, n_raters, manter)
+    return panel, frases["ItemNumber"].max(), panel_raters(generos, n_raters)
+
+def _process_file_safe(file_path, n_raters=4):
+    # Runs in the worker: errors are reported back instead of killing the pool
+    try:
+        return process_file(file_path, n_raters), None
+    except Exception as e:
+        return None, str(e)
+
+def main(log_folder=os.path.join("logs", "logs_brutos"), max_workers=None, n_raters=4):
+    """
+    Parses every raw log of the folder in a process pool (max_workers=1 runs
+    sequentially) and applies the ItemNumber offsets afterwards, in file order.
+    Each panel keeps n_raters participants per gender. The offsets of a file
+    depend on every file before it, so nothing is written if any file fails.
+    """
+    files_to_process = list_log_files(log_folder)
+    process = partial(_process_file_safe, n_raters=n_raters)
+
+    if max_workers == 1:
+        results = [process(file_path) for file_path in files_to_process]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(process, files_to_process))
+
+    errors = [(os.path.basename(file_path), error)
+              for file_path, (_, error) in zip(files_to_process, results) if error is not None]
+    if errors:
+        for filename, error in errors:
+            print(f"Error processing {filename}: {error}")
+        print("Nothing was written: the ItemNumber offsets need every file")
+        return
 
-def main():
     all_processed_data = []
     base_item_number = 0
-    
-    # Use relative path for logs folder
-    log_folder = os.path.join("logs\logs_brutos")
-    base_filename = "results_prod"
-    
-    # Process base file and numbered files
-    files_to_process = [f"{base_filename}.csv"] + [f"{base_filename} ({i}).csv" for i in range(1, 10)]
-    
-    for filename in files_to_process:
-        file_path = os.path.join(log_folder, filename)
-        if not os.path.exists(file_path):
-            continue
-            
-        print(f"Processing file: {filename}")
-        try:
-            frases, generos = process_log_file(file_path)
-            
-            # Add offset to ItemNumber for subsequent files
-            frases["ItemNumber"] = frases["ItemNumber"] + base_item_number
-            
-            # Process this file's data independently
-            generos["GeneroCod"] = generos["Genero"].str.lower().map(lambda g: "m" if "masculino" in g else "f")
-            
-            # Get 4 participants of each gender for this file
-            ids_masculinos = generos[generos["GeneroCod"] == "m"].head(4)["ParticipantMD5"].tolist()
-            ids_femininos = generos[generos["GeneroCod"] == "f"].head(4)["ParticipantMD5"].tolist()
-            ids_selecionados = ids_femininos + ids_masculinos
-            
-            frases_filtradas = frases[frases["ParticipantMD5"].isin(ids_selecionados)].copy()
-
-            # Create pivot tables with generic identifiers
-            pivot_class = frases_filtradas.pivot_table(
-                index="ItemNumber", 
-                columns="ParticipantMD5", 
-                values="Classificacao", 
-                aggfunc="first"
-            )
-            
-            pivot_time = frases_filtradas.pivot_table(
-                index="ItemNumber", 
-                columns="ParticipantMD5", 
-                values="Tempo_Gasto", 
-                aggfunc="first"
-            )
-
-            # Rename columns to generic identifiers
-            fem_cols = [col for col in pivot_class.columns if generos.loc[generos["ParticipantMD5"] == col, "GeneroCod"].iloc[0] == "f"]
-            masc_cols = [col for col in pivot_class.columns if generos.loc[generos["ParticipantMD5"] == col, "GeneroCod"].iloc[0] == "m"]
-
-            rename_dict_class = {}
-            rename_dict_time = {}
-            
-            for i, col in enumerate(fem_cols[:4], 1):
-                rename_dict_class[col] = f"f{i}_class"
-                rename_dict_time[col] = f"f{i}_tempo"
-            
-            for i, col in enumerate(masc_cols[:4], 1):
-                rename_dict_class[col] = f"m{i}_class"
-                rename_dict_time[col] = f"m{i}_tempo"
-
-            pivot_class = pivot_class.rename(columns=rename_dict_class)
-            pivot_time = pivot_time.rename(columns=rename_dict_time)
-            
-            frases_limitadas = pd.concat([pivot_class, pivot_time], axis=1).reset_index()
-
-            # Calculate majority classifications
-            def majoritaria(row, prefixo):
-                colunas = [f"{prefixo}{i}_class" for i in range(1, 5)]
-                respostas = [row[col] for col in colunas if pd.notna(row[col])]
-                if respostas:
-                    return Counter(respostas).most_common(1)[0][0]
-                return None
-
-            def contar_iguais_majoritaria(row, prefixo, majoritaria):
-                colunas = [f"{prefixo}{i}_class" for i in range(1, 5)]
-                return sum(1 for col in colunas if pd.notna(row[col]) and row[col] == row[majoritaria])
-
-            frases_limitadas["cla_maj_femi"] = frases_limitadas.apply(lambda row: majoritaria(row, "f"), axis=1)
-            frases_limitadas["cla_maj_masc"] = frases_limitadas.apply(lambda row: majoritaria(row, "m"), axis=1)
-            
-            frases_limitadas["qtd_maj_femi"] = frases_limitadas.apply(
-                lambda row: contar_iguais_majoritaria(row, "f", "cla_maj_femi"), axis=1
-            )
-            frases_limitadas["qtd_maj_masc"] = frases_limitadas.apply(
-                lambda row: contar_iguais_majoritaria(row, "m", "cla_maj_masc"), axis=1
-            )
-
-            # Organize columns
-            colunas_final = [
-                "ItemNumber",
-                # Majorities and quantities
-                "cla_maj_femi", "qtd_maj_femi",
-                "cla_maj_masc", "qtd_maj_masc",
-                # All female classifications together
-                "f1_class", "f2_class", "f3_class", "f4_class",
-                # All male classifications together
-                "m1_class", "m2_class", "m3_class", "m4_class",
-                # All time columns
-                "f1_tempo", "f2_tempo", "f3_tempo", "f4_tempo",
-                "m1_tempo", "m2_tempo", "m3_tempo", "m4_tempo"
-            ]
-
-            frases_formatadas = frases_limitadas[colunas_final]
-            all_processed_data.append(frases_formatadas)
-            
-            # Update base_item_number for next file
-            base_item_number = frases["ItemNumber"].max()
-            
-        except Exception as e:
-            print(f"Error processing {filename}: {str(e)}")
+
+    for file_path, (result, _) in zip(files_to_process, results):
+        print(f"Processing file: {os.path.basename(file_path)}")
+        frases_formatadas, max_item_number, _ = result
+
+        # Add offset to ItemNumber for subsequent files
+        frases_formatadas = frases_formatadas.assign(ItemNumber=frases_formatadas["ItemNumber"] + base_item_number)
+        all_processed_data.append(frases_formatadas)
+
+        # Update base_item_number for next file
+        base_item_number += max_item_number
     
     if all_processed_data:
         # Combine all results and save
@@ -174,4 +199,4 @@ def main():
         print("No files were processed successfully!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
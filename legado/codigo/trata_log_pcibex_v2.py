@@ -8,36 +8,99 @@ Original file is located at
 """
 
 # Importando bibliotecas necessárias
+import os
+import re
+
 import pandas as pd
+from openpyxl import Workbook
 
 
 
 # Nome do arquivo CSV (substitua pelo nome do arquivo importado)
 file_name = "results_dev.csv"  # Coloque o nome correto do arquivo
 
-# Lendo o arquivo CSV ignorando linhas que começam com '#'
-df = pd.read_csv(file_name, comment='#', header=None)
-
-# Desativar a notação científica para todas as colunas
-pd.options.display.float_format = '{:,.6f}'.format
+# Formato da exportação por participante:
+#   "excel"         - acrescenta as abas ao Excel, como antes; se o arquivo ainda não
+#                     existe, grava todas as abas em uma passada (write-only)
+#   "excel_anexar"  - sempre acrescenta as abas pelo ExcelWriter (lento com muitas abas)
+#   "csv"/"parquet" - um arquivo por participante em pasta_saida
+modo_exportacao = "excel"
 
-# Nome do arquivo Excel existente onde os dados serão salvos como uma nova aba
+# Nome do arquivo Excel onde os dados serão salvos, uma aba por participante
 excel_file_name = "Res_Pre.xlsx"
 
-# Identificando o nome das colunas (a primeira linha do arquivo CSV agora é tratada como um registro)
-colunas = [f"Coluna_{i+1}" for i in range(df.shape[1])]
-df.columns = colunas
-
-# Agrupar o DataFrame pelo identificador da primeira coluna
-grupo_identificador = colunas[0]
-grupos = df.groupby(grupo_identificador)
-
-try:
-    with pd.ExcelWriter(excel_file_name, engine='openpyxl', mode='a') as writer:
-        for nome_grupo, grupo_df in grupos:
-            # Escrever cada grupo em uma aba nomeada com o identificador do grupo
-            grupo_df.to_excel(writer, sheet_name=str(nome_grupo), index=False)
-except FileNotFoundError:
-    with pd.ExcelWriter(excel_file_name, engine='openpyxl') as writer:
-        for nome_grupo, grupo_df in grupos:
-            grupo_df.to_excel(writer, sheet_name=str(nome_grupo), index=False)
+# Pasta dos arquivos por participante (modos "csv" e "parquet")
+pasta_saida = "Res_Pre"
+
+# Caracteres proibidos em nomes de aba e tamanho máximo aceito pelo Excel
+_PROIBIDOS_ABA = re.compile(r"[\[\]:*?/\\]")
+_MAX_NOME_ABA = 31
+
+def nome_aba(nome_grupo):
+    """Nome de aba válido para o Excel a partir do identificador do grupo"""
+    return _PROIBIDOS_ABA.sub("_", str(nome_grupo))[:_MAX_NOME_ABA]
+
+def exportar_excel(grupos, caminho):
+    """
+    Grava todas as abas em uma única passada com um workbook write-only do
+    openpyxl: as linhas vão direto para o arquivo, sem montar as planilhas em
+    memória nem reabrir o workbook a cada aba. Só cria arquivos novos: um
+    Excel existente não é sobrescrito (use exportar_excel_anexando).
+    """
+    if os.path.exists(caminho):
+        raise FileExistsError(f"{caminho} já existe; as abas dele seriam perdidas")
+    wb = Workbook(write_only=True)
+    for nome_grupo, grupo_df in grupos:
+        ws = wb.create_sheet(title=nome_aba(nome_grupo))
+        ws.append(list(grupo_df.columns))
+        # Células vazias no lugar de NaN, como o to_excel faria
+        valores = grupo_df.astype(object).where(grupo_df.notna(), None)
+        for linha in valores.itertuples(index=False, name=None):
+            ws.append(linha)
+    wb.save(caminho)
+
+def exportar_excel_anexando(grupos, caminho):
+    """Acrescenta as abas a um Excel existente (ou cria um novo)"""
+    try:
+        with pd.ExcelWriter(caminho, engine='openpyxl', mode='a') as writer:
+            for nome_grupo, grupo_df in grupos:
+                # Escrever cada grupo em uma aba nomeada com o identificador do grupo
+                grupo_df.to_excel(writer, sheet_name=nome_aba(nome_grupo), index=False)
+    except FileNotFoundError:
+        with pd.ExcelWriter(caminho, engine='openpyxl') as writer:
+            for nome_grupo, grupo_df in grupos:
+                grupo_df.to_excel(writer, sheet_name=nome_aba(nome_grupo), index=False)
+
+def exportar_arquivos(grupos, pasta, formato="parquet"):
+    """Um arquivo CSV ou Parquet por participante na pasta indicada"""
+    os.makedirs(pasta, exist_ok=True)
+    for nome_grupo, grupo_df in grupos:
+        caminho = os.path.join(pasta, f"{nome_aba(nome_grupo)}.{formato}")
+        if formato == "parquet":
+            grupo_df.to_parquet(caminho, index=False)
+        else:
+            grupo_df.to_csv(caminho, index=False)
+
+if __name__ == "__main__":
+    # Lendo o arquivo CSV ignorando linhas que começam com '#'
+    df = pd.read_csv(file_name, comment='#', header=None)
+
+    # Desativar a notação científica para todas as colunas
+    pd.options.display.float_format = '{:,.6f}'.format
+
+    # Identificando o nome das colunas (a primeira linha do arquivo CSV agora é tratada como um registro)
+    colunas = [f"Coluna_{i+1}" for i in range(df.shape[1])]
+    df.columns = colunas
+
+    # Agrupar o DataFrame pelo identificador da primeira coluna
+    grupo_identificador = colunas[0]
+    grupos = df.groupby(grupo_identificador)
+
+    if modo_exportacao == "excel" and not os.path.exists(excel_file_name):
+        exportar_excel(grupos, excel_file_name)
+    elif modo_exportacao in ("excel", "excel_anexar"):
+        exportar_excel_anexando(grupos, excel_file_name)
+    elif modo_exportacao in ("csv", "parquet"):
+        exportar_arquivos(grupos, pasta_saida, modo_exportacao)
+    else:
+        raise ValueError(f"Modo de exportação desconhecido: {modo_exportacao}")
@@ -10,13 +10,13 @@ Original file is located at
 import pandas as pd
 from collections import Counter
 
+from leitor_pcibex import pivot_selecoes, read_header
+
 # === 1. Leitura do CSV original ===
-df = pd.read_csv("results_prod.csv", skiprows=19, header=None)
-df.columns = [
-    "ReceptionTime", "ParticipantMD5", "Controller", "ItemNumber", "InnerElementNumber",
-    "Label", "Group", "PennElementType", "PennElementName", "Parameter",
-    "Value", "EventTime", "Comments"
-]
+# Colunas lidas do cabeçalho de comentários, em vez de pular 19 linhas fixas
+with open("results_prod.csv", "r", encoding="utf-8") as arquivo:
+    colunas, _ = read_header(arquivo)
+    df = pd.read_csv(arquivo, header=None, names=colunas)
 df = df[~df["ReceptionTime"].astype(str).str.startswith("#")].copy()
 df = df[~df["Label"].isin(["TCLE", "instrucoes", "agradecimento"])]
 df.reset_index(drop=True, inplace=True)
@@ -67,8 +67,7 @@ def formatar_id(pid):
     sufixo = "M" if "masculino" in genero.lower() else "F"
     return f"{sufixo}_{pid[:4]}"
 
-pivot_class = frases_filtradas.pivot_table(index="ItemNumber", columns="ParticipantMD5", values="Classificacao", aggfunc="first")
-pivot_time = frases_filtradas.pivot_table(index="ItemNumber", columns="ParticipantMD5", values="Tempo_Gasto", aggfunc="first")
+pivot_class, pivot_time = pivot_selecoes(frases_filtradas, manter="first")
 pivot_class.columns = [f"{formatar_id(pid)}_class" for pid in pivot_class.columns]
 pivot_time.columns = [f"{formatar_id(pid)}_tempo" for pid in pivot_time.columns]
 frases_limitadas = pd.concat([pivot_class, pivot_time], axis=1).reset_index()
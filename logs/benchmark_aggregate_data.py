@@ -0,0 +1,88 @@
+"""
+Benchmark de aggregate_data: implementação vetorizada contra a agregação
+original, que chamava get_totals/get_majority_class em Python para cada frase.
+
+Uso:
+    python benchmark_aggregate_data.py [numero_de_frases]
+"""
+import sys
+import time
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from log_processor import aggregate_data, attach_text
+
+def get_majority_class_original(group):
+    """Cópia da implementação anterior, mantida apenas como referência"""
+    value_counts = group.value_counts()
+    if len(value_counts) > 1 and value_counts.iloc[0] == value_counts.iloc[1]:
+        return 'empate'
+    return value_counts.index[0]
+
+def aggregate_data_original(df: pd.DataFrame) -> pd.DataFrame:
+    """Cópia da implementação anterior, mantida apenas como referência"""
+    def get_totals(group):
+        counts = group.value_counts()
+        return {
+            'classificacao_majoritaria': get_majority_class_original(group),
+            'total_positiva': counts.get('positiva', 0),
+            'total_negativa': counts.get('negativa', 0),
+            'total_neutra': counts.get('neutra', 0)
+        }
+
+    agg_df = (df.groupby('frase')
+              .agg({
+                  'Value': get_totals,
+                  'duracao': 'mean',
+                  'ParticipantMD5': 'count'
+              }))
+    value_columns = pd.DataFrame(agg_df['Value'].tolist(), index=agg_df.index)
+    agg_df = agg_df.drop('Value', axis=1)
+    agg_df = pd.concat([agg_df, value_columns], axis=1)
+    agg_df = agg_df.rename(columns={
+        'duracao': 'duracao_media',
+        'ParticipantMD5': 'total_classificacoes'
+    })
+    return agg_df.reset_index()
+
+def synthetic_logs(n_frases: int, seed: int = 0) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Gera classificações sintéticas (3 a 6 por frase) e a tabela de frases"""
+    rng = np.random.default_rng(seed)
+    per_frase = rng.integers(3, 7, size=n_frases)
+    frase_ids = np.repeat(np.arange(n_frases), per_frase)
+    n = len(frase_ids)
+    prefix = 'Frase sintética de tamanho parecido com as do MQD-1465, número '
+    sentences = pd.DataFrame({'id': np.arange(n_frases)})
+    sentences['frase'] = sentences['id'].map(lambda i: f'{prefix}{i:07d}.')
+    sentences = sentences.set_index('id', drop=False)
+    df = pd.DataFrame({
+        'ParticipantMD5': rng.integers(0, 2**62, size=n).astype(str),
+        'GeneroCod': rng.choice(['m', 'f'], size=n),
+        'frase': sentences['frase'].to_numpy()[frase_ids],
+        'id': frase_ids,
+        'Value': rng.choice(['positiva', 'negativa', 'neutra'], size=n),
+        'duracao': rng.gamma(2.0, 4.0, size=n).round(3)
+    })
+    return df, sentences
+
+def timed(func, df):
+    start = time.perf_counter()
+    result = func(df)
+    return result, time.perf_counter() - start
+
+def main():
+    n_frases = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    df, sentences = synthetic_logs(n_frases)
+    print(f"{n_frases} frases, {len(df)} classificações")
+
+    original, t_original = timed(aggregate_data_original, df)
+    vetorizado, t_vetorizado = timed(aggregate_data, df)
+    pd.testing.assert_frame_equal(original, attach_text(vetorizado, sentences), check_dtype=False)
+
+    print(f"original:   {t_original:8.2f} s")
+    print(f"vetorizado: {t_vetorizado:8.2f} s ({t_original / t_vetorizado:.1f}x)")
+
+if __name__ == "__main__":
+    main()
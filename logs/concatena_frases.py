@@ -0,0 +1,224 @@
+"""
+Concatena as frases de cada bloco às classificações dos logs brutos, identificando
+o gênero e a duração de cada resposta (bloco_N_concatenado.csv).
+
+Extraído de "02. concatena_frases.ipynb" para poder ser importado.
+"""
+import csv
+import os
+import re
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Leitura do cabeçalho compartilhada com os scripts de legado/codigo
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'legado' / 'codigo'))
+from leitor_pcibex import read_header
+
+__all__ = [
+    'criar_pasta_tratamento',
+    'carregar_blocos_randomizados',
+    'extrair_genero',
+    'calcular_duracoes',
+    'listar_logs_brutos',
+    'processar_arquivo_log',
+    'processar_todos_arquivos'
+]
+
+# Frases por bloco: o ItemNumber de cada bloco recomeça do zero
+FRASES_POR_BLOCO = 150
+
+# Colunas de cada bloco_N_concatenado.csv
+COLUNAS_BLOCO = ["ParticipantMD5", "GeneroCod", "frase", "Value", "duracao", "completo"]
+
+def criar_pasta_tratamento() -> str:
+    """
+    Cria a pasta logs_em_tratamento se ela não existir
+    """
+    pasta_destino = "logs_em_tratamento"
+    if not os.path.exists(pasta_destino):
+        os.makedirs(pasta_destino)
+    return pasta_destino
+
+def carregar_blocos_randomizados() -> pd.DataFrame:
+    """
+    Carrega o arquivo com as frases e seus respectivos blocos
+    """
+    blocos_path = "../dados/MQD_1465_blocos_randomizados.csv"
+    return pd.read_csv(
+        blocos_path,
+        sep='\t',
+        quoting=csv.QUOTE_ALL,
+        quotechar='"',
+        encoding='utf-8'
+    )
+
+def extrair_genero(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Extrai o gênero dos participantes do arquivo de log
+    """
+    genero_data = df[
+        (df["Label"] == "genero") &
+        (df["PennElementName"] == "selecionaGenero") &
+        (df["Parameter"] == "Selected")
+    ][["ParticipantMD5", "Value"]].copy()
+
+    genero_data["GeneroCod"] = genero_data["Value"].str.lower().map(
+        lambda g: "m" if "masculino" in g else "f"
+    )
+
+    return genero_data[["ParticipantMD5", "GeneroCod"]]
+
+def calcular_duracoes(df_trials: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calcula a duração (em segundos) de cada trial a partir dos eventos Start/End.
+
+    Um único groupby conta os eventos e pega o primeiro EventTime de cada tipo;
+    Start e End viram colunas. Trials sem exatamente um Start e um End não são
+    descartados: ficam com duracao vazia e completo=False.
+    Retorna ParticipantMD5, ItemNumber, duracao e completo.
+    """
+    chave = ["ParticipantMD5", "ItemNumber"]
+    eventos = (df_trials
+               .groupby(chave + ["Value"])["EventTime"]
+               .agg(["size", "min"])
+               .unstack("Value")
+               .reindex(columns=pd.MultiIndex.from_product([["size", "min"], ["Start", "End"]])))
+
+    contagens = eventos["size"].fillna(0)
+    completo = (contagens["Start"] == 1) & (contagens["End"] == 1)
+    duracao = (eventos["min"]["End"] - eventos["min"]["Start"]) / 1000.0  # Converte para segundos
+
+    return pd.DataFrame({
+        "duracao": duracao.where(completo, np.nan),
+        "completo": completo
+    }).reset_index()
+
+def listar_logs_brutos(pasta) -> List[Tuple[int, Path]]:
+    """
+    Lista os logs brutos da pasta com o número do bloco de cada um:
+    results_prod.csv é o bloco 1, results_prod (N).csv é o bloco N + 1
+    """
+    padrao = re.compile(r"^results_prod(?: \((\d+)\))?\.csv$")
+    logs = []
+    for arquivo in Path(pasta).iterdir():
+        match = padrao.match(arquivo.name)
+        if match:
+            logs.append((int(match.group(1) or 0) + 1, arquivo))
+    return sorted(logs)
+
+def processar_arquivo_log(file_path: str, frases_bloco: pd.DataFrame, num_bloco: int) -> pd.DataFrame:
+    """
+    Processa um arquivo de log substituindo as frases originais pelas do bloco correto
+    e calcula a duração dos trials. Retorna as colunas de COLUNAS_BLOCO; completo é
+    False nas classificações cujo trial não tem exatamente um Start e um End.
+    """
+    # Lê o arquivo de log com as colunas descritas no próprio cabeçalho
+    with open(file_path, "r", encoding="utf-8") as arquivo:
+        colunas, _ = read_header(arquivo)
+        df = pd.read_csv(arquivo, header=None, names=colunas, comment="#")
+
+    # Converte EventTime para numérico
+    df["EventTime"] = pd.to_numeric(df["EventTime"], errors="coerce")
+
+    # Extrai informações de gênero
+    generos = extrair_genero(df)
+
+    # Ajuste do ItemNumber de acordo com o bloco
+    deslocamento = 3 - (num_bloco - 1) * FRASES_POR_BLOCO
+
+    # Filtra eventos de início e fim dos trials
+    df_trials = df[
+        (df["Label"] == "frases") &
+        (df["Value"].isin(["Start", "End"]))
+    ].copy()
+    df_trials["ItemNumber"] = df_trials["ItemNumber"] - deslocamento
+
+    df_duracoes = calcular_duracoes(df_trials)
+
+    # Filtra apenas as linhas de classificação
+    df_classificacoes = df[
+        (df["Label"] == "frases") &
+        (df["Parameter"] == "Selection")
+    ].copy()
+    df_classificacoes["ItemNumber"] = df_classificacoes["ItemNumber"] - deslocamento
+
+    # Merge com as frases do bloco
+    df_final = df_classificacoes.merge(
+        frases_bloco[["id", "frase"]],
+        left_on="ItemNumber",
+        right_on="id",
+        how="inner"
+    )
+
+    # Adiciona informação de gênero
+    df_final = df_final.merge(
+        generos,
+        on="ParticipantMD5",
+        how="left"
+    )
+
+    # Adiciona informação de duração
+    df_final = df_final.merge(
+        df_duracoes,
+        on=["ParticipantMD5", "ItemNumber"],
+        how="left"
+    )
+
+    # Classificações sem nenhum evento de trial também contam como incompletas
+    df_final["completo"] = df_final["completo"].fillna(False).astype(bool)
+    incompletos = int((~df_final["completo"]).sum())
+    if incompletos:
+        print(f"AVISO: {incompletos} classificações sem Start/End completos no trial (duracao vazia)")
+
+    return df_final[COLUNAS_BLOCO]
+
+def processar_todos_arquivos():
+    """
+    Processa todos os arquivos de log, correlacionando com os blocos corretos
+    """
+    pasta_destino = criar_pasta_tratamento()
+    df_blocos = carregar_blocos_randomizados()
+
+    # Para cada arquivo de log (0 a 9)
+    for i in range(10):
+        num_bloco = i + 1
+        if i == 0:
+            arquivo_origem = "logs_brutos/results_prod.csv"
+        else:
+            arquivo_origem = f"logs_brutos/results_prod ({i}).csv"
+
+        arquivo_destino = f"{pasta_destino}/bloco_{num_bloco}_concatenado.csv"
+
+        if os.path.exists(arquivo_origem):
+            print(f"\nProcessando bloco {num_bloco} - Arquivo: {arquivo_origem}")
+
+            frases_bloco = df_blocos[df_blocos['bloco'] == num_bloco].copy()
+            print(f"Frases encontradas no bloco {num_bloco}: {len(frases_bloco)}")
+
+            try:
+                df_processado = processar_arquivo_log(arquivo_origem, frases_bloco, num_bloco)
+
+                if len(df_processado) > 0:
+                    df_processado.to_csv(
+                        arquivo_destino,
+                        sep='\t',
+                        index=False,
+                        quoting=csv.QUOTE_ALL,
+                        quotechar='"',
+                        encoding='utf-8'
+                    )
+                    print(f"Arquivo salvo: {arquivo_destino}")
+                    print(f"Total de classificações: {len(df_processado)}")
+                else:
+                    print(f"AVISO: Nenhuma classificação encontrada para o bloco {num_bloco}")
+            except Exception as e:
+                print(f"Erro ao processar bloco {num_bloco}: {str(e)}")
+        else:
+            print(f"Arquivo não encontrado: {arquivo_origem}")
+
+if __name__ == "__main__":
+    processar_todos_arquivos()
@@ -1,17 +1,36 @@
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 from dataclasses import dataclass
+import csv
+import hashlib
+import json
 import os
+import re
+import sys
 
 __all__ = [
     'Paths',
+    'load_sentences',
+    'sentence_ids',
+    'attach_text',
     'consolidate_logs',
+    'consolidate_frames',
     'split_by_gender',
     'aggregate_data',
+    'aggregate_by_gender',
+    'majority_from_counts',
     'find_ties',
     'remove_ties',
-    'get_removed_ties'
+    'get_removed_ties',
+    'list_block_files',
+    'read_block',
+    'load_blocks',
+    'save_results',
+    'write_gender_dumps',
+    'write_output',
+    'read_output'
 ]
 
 @dataclass
@@ -27,80 +46,211 @@ class Paths:
     female_agg_no_ties: Path = base_dir / 'logs_feminino_agregado_sem_empates.csv'
     ties: Path = base_dir / 'empates_duplos.csv'
     removed_ties: Path = base_dir / 'frases_removidas_por_empate.csv'
+    sentences: Path = Path('..') / 'dados' / 'MQD_1465_blocos_randomizados.csv'
+    cache_dir: Path = base_dir / 'cache'
+    manifest: Path = cache_dir / 'manifest.json'
+    output_format: str = 'csv'  # 'csv' (tab-separado) ou 'parquet'
 
-def consolidate_logs(paths: Paths) -> pd.DataFrame:
-    """Consolida todos os arquivos de log em um único DataFrame"""
-    # Ajusta o caminho para ser relativo ao script
+    def output(self, path: Path) -> Path:
+        """Caminho de um arquivo de saída no formato configurado"""
+        if self.output_format == 'parquet':
+            return path.with_suffix('.parquet')
+        return path
+
+# Tipos fixos na leitura dos blocos para que cada bloco seja serializado
+# exatamente como seria dentro do arquivo consolidado
+BLOCK_DTYPES = {
+    'ParticipantMD5': str,
+    'GeneroCod': str,
+    'frase': str,
+    'Value': str,
+    'duracao': 'float64'
+}
+
+# Colunas gravadas como categóricas no Parquet
+CATEGORICAL_COLUMNS = [
+    'ParticipantMD5',
+    'GeneroCod',
+    'Value',
+    'classificacao_majoritaria',
+    'empate_masculino',
+    'empate_feminino'
+]
+
+# Colunas de cada bloco guardadas no cache para a agregação
+AGGREGATION_COLUMNS = ['ParticipantMD5', 'GeneroCod', 'Value', 'duracao']
+
+# Partes de cada entrada de cache, gravadas em arquivos separados para que
+# cada saída só carregue (e só produza) o que usa: o texto serializado para o
+# CSV, ou o bloco tipado (colunas de BLOCK_DTYPES, em Parquet) para o Parquet
+CACHE_PARTS = {
+    'resumo': ['header', 'registros', 'registros_m', 'registros_f', 'agregacao'],
+    'linhas': ['linhas'],
+    'genero': ['linhas_m', 'linhas_f'],
+    'tabela': ['tabela']
+}
+
+# Versão do formato das entradas de cache; mudá-la invalida o cache inteiro
+CACHE_VERSION = 4
+
+def write_output(df: pd.DataFrame, path: Path) -> None:
+    """Grava um arquivo de saída: Parquet tipado se o sufixo for .parquet, senão CSV tab-separado"""
+    if path.suffix == '.parquet':
+        categorical = [col for col in CATEGORICAL_COLUMNS if col in df.columns]
+        df.astype({col: 'category' for col in categorical}).to_parquet(path, index=False)
+    else:
+        df.to_csv(path, sep='\t', index=False)
+
+def read_output(path: Path) -> pd.DataFrame:
+    """Lê um arquivo de saída gravado por write_output (ou pelo pipeline em CSV)"""
+    if path.suffix == '.parquet':
+        return pd.read_parquet(path)
+    return pd.read_csv(path, sep='\t')
+
+def list_block_files(paths: Paths) -> List[Path]:
+    """Lista os arquivos bloco_N_concatenado.csv ordenados pelo número do bloco"""
     script_dir = Path(__file__).parent
     full_path = script_dir / paths.base_dir
-    
+
     bloco_files = list(full_path.glob('bloco_*_concatenado.csv'))
     if not bloco_files:
         raise FileNotFoundError(
             f"Nenhum arquivo 'bloco_*_concatenado.csv' encontrado em {full_path}. "
             "Verifique se os arquivos de entrada estão no diretório correto."
         )
-    dfs = [pd.read_csv(file, sep='\t') for file in bloco_files]
-    return pd.concat(dfs, ignore_index=True)
+    def block_number(file: Path):
+        match = re.search(r'bloco_(\d+)_', file.name)
+        return (int(match.group(1)) if match else 0, file.name)
+    return sorted(bloco_files, key=block_number)
+
+def read_block(file: Path) -> pd.DataFrame:
+    """
+    Lê um bloco_N_concatenado.csv com as colunas e tipos de BLOCK_DTYPES (colunas
+    auxiliares dos blocos, como completo, não entram no consolidado)
+    """
+    return pd.read_csv(file, sep='\t', dtype=BLOCK_DTYPES, usecols=list(BLOCK_DTYPES))
+
+def load_sentences(paths: Paths) -> pd.DataFrame:
+    """Carrega a tabela de frases (id, id_original, frase, bloco) indexada pelo id"""
+    script_dir = Path(__file__).parent
+    sentences = pd.read_csv(
+        script_dir / paths.sentences,
+        sep='\t',
+        quoting=csv.QUOTE_ALL,
+        quotechar='"',
+        encoding='utf-8'
+    )
+    return sentences.set_index('id', drop=False).sort_index()
+
+def sentence_ids(frases: pd.Series, sentences: pd.DataFrame) -> pd.Series:
+    """
+    Converte o texto das frases no id inteiro da tabela de frases.
+
+    Textos repetidos na tabela recebem o menor id. Frases que não casam exatamente
+    são procuradas de novo sem espaços nas pontas.
+    """
+    lookup = sentences.drop_duplicates('frase').set_index('frase')['id']
+    ids = frases.map(lookup)
+    missing = ids.isna()
+    if missing.any():
+        stripped = lookup.copy()
+        stripped.index = stripped.index.str.strip()
+        stripped = stripped[~stripped.index.duplicated()]
+        ids[missing] = frases[missing].str.strip().map(stripped)
+        missing = ids.isna()
+        if missing.any():
+            raise ValueError(
+                f"{missing.sum()} classificações com frases ausentes da tabela de frases, "
+                f"por exemplo: {frases[missing].iloc[0][:80]!r}"
+            )
+    return ids.astype('int64')
+
+def attach_text(df: pd.DataFrame, sentences: pd.DataFrame) -> pd.DataFrame:
+    """Troca a coluna id pelo texto da frase, para gravação dos arquivos de saída"""
+    result = df.drop(columns='id')
+    result.insert(0, 'frase', sentences['frase'].reindex(df['id']).to_numpy())
+    return result
+
+def consolidate_logs(paths: Paths) -> pd.DataFrame:
+    """Consolida todos os arquivos de log em um único DataFrame, com o id de cada frase"""
+    dfs = [read_block(file) for file in list_block_files(paths)]
+    return consolidate_frames(dfs, load_sentences(paths))
+
+def consolidate_frames(dfs: List[pd.DataFrame], sentences: pd.DataFrame) -> pd.DataFrame:
+    """Consolida blocos já carregados em memória, com o id de cada frase"""
+    df = pd.concat(dfs, ignore_index=True)
+    df['id'] = sentence_ids(df['frase'], sentences)
+    return df
 
 def split_by_gender(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """Separa o DataFrame por gênero"""
     return df[df['GeneroCod'] == 'm'], df[df['GeneroCod'] == 'f']
 
-def get_majority_class(group):
-    """Determina a classificação majoritária"""
-    value_counts = group.value_counts()
-    if len(value_counts) > 1 and value_counts.iloc[0] == value_counts.iloc[1]:
-        return 'empate'
-    return value_counts.index[0]
+def majority_from_counts(counts: pd.DataFrame) -> pd.Series:
+    """
+    Determina a classificação majoritária a partir de uma matriz de contagens
+    (uma coluna por classificação). Retorna 'empate' quando as duas maiores
+    contagens são iguais.
+    """
+    values = counts.to_numpy()
+    if values.shape[1] == 0:
+        return pd.Series(None, index=counts.index, dtype=object)
+    majority = pd.Series(counts.columns.to_numpy()[values.argmax(axis=1)], index=counts.index)
+    if values.shape[1] > 1:
+        top_two = -np.partition(-values, 1, axis=1)[:, :2]
+        majority[top_two[:, 0] == top_two[:, 1]] = 'empate'
+    majority[values.max(axis=1) == 0] = None
+    return majority
 
-def aggregate_data(df: pd.DataFrame) -> pd.DataFrame:
-    """Agrega os dados por frase"""
-    def get_totals(group):
-        counts = group.value_counts()
-        return {
-            'classificacao_majoritaria': get_majority_class(group),
-            'total_positiva': counts.get('positiva', 0),
-            'total_negativa': counts.get('negativa', 0),
-            'total_neutra': counts.get('neutra', 0)
-        }
-
-    agg_df = (df.groupby('frase')
-              .agg({
-                  'Value': get_totals,
-                  'duracao': 'mean',
-                  'ParticipantMD5': 'count'
-              }))
-    
-    # Expande os resultados da agregação
-    value_columns = pd.DataFrame(agg_df['Value'].tolist(), index=agg_df.index)
-    agg_df = agg_df.drop('Value', axis=1)
-    agg_df = pd.concat([agg_df, value_columns], axis=1)
-    
-    # Renomeia colunas
-    agg_df = agg_df.rename(columns={
-        'duracao': 'duracao_media',
-        'ParticipantMD5': 'total_classificacoes'
+def _aggregate(df: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+    """Agrega duração, total e contagem de cada classificação pelas chaves dadas"""
+    grouped = df.groupby(keys)
+    agg_df = pd.DataFrame({
+        'duracao_media': grouped['duracao'].mean(),
+        'total_classificacoes': grouped['ParticipantMD5'].count()
     })
     
-    return agg_df.reset_index()
+    # Contagem de cada classificação por frase (uma coluna por Value)
+    counts = (df.groupby(keys + ['Value']).size()
+              .unstack(fill_value=0)
+              .reindex(agg_df.index, fill_value=0))
+    agg_df['classificacao_majoritaria'] = majority_from_counts(counts)
+    for value in ['positiva', 'negativa', 'neutra']:
+        agg_df[f'total_{value}'] = counts[value] if value in counts else 0
+    
+    return agg_df
+
+def aggregate_data(df: pd.DataFrame) -> pd.DataFrame:
+    """Agrega os dados por frase (coluna id)"""
+    return _aggregate(df, ['id']).reset_index()
+
+def aggregate_by_gender(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Agrega os dois gêneros com um único groupby por (GeneroCod, id) sobre o
+    consolidado, sem criar as cópias de split_by_gender. Retorna os agregados
+    masculino e feminino no esquema de aggregate_data.
+    """
+    agg_df = _aggregate(df, ['GeneroCod', 'id'])
+    genders = agg_df.index.get_level_values('GeneroCod')
+    return tuple(agg_df[genders == genero].droplevel('GeneroCod').reset_index()
+                 for genero in ['m', 'f'])
 
 def find_ties(male_agg: pd.DataFrame, female_agg: pd.DataFrame) -> pd.DataFrame:
     """Encontra frases com empate em ambos os gêneros"""
     empates = pd.merge(
-        male_agg[male_agg['classificacao_majoritaria'] == 'empate'][['frase']],
-        female_agg[female_agg['classificacao_majoritaria'] == 'empate'][['frase']],
-        on='frase',
+        male_agg[male_agg['classificacao_majoritaria'] == 'empate'][['id']],
+        female_agg[female_agg['classificacao_majoritaria'] == 'empate'][['id']],
+        on='id',
         how='inner'
     )
     
     return empates.merge(
         male_agg, 
-        on='frase', 
+        on='id', 
         suffixes=('', '_m')
     ).merge(
         female_agg, 
-        on='frase', 
+        on='id', 
         suffixes=('_m', '_f')
     )
 
@@ -110,36 +260,183 @@ def remove_ties(df: pd.DataFrame) -> pd.DataFrame:
 
 def get_removed_ties(male_agg: pd.DataFrame, female_agg: pd.DataFrame) -> pd.DataFrame:
     """Obtém as frases que foram removidas por terem empate em pelo menos um dos gêneros"""
-    # Identifica frases com empate em cada gênero
-    male_ties = male_agg[male_agg['classificacao_majoritaria'] == 'empate']['frase']
-    female_ties = female_agg[female_agg['classificacao_majoritaria'] == 'empate']['frase']
+    male = male_agg.set_index('id')
+    female = female_agg.set_index('id')
     
-    # Une as frases com empate de ambos os gêneros
-    all_ties = pd.concat([male_ties, female_ties]).unique()
+    # Une as frases com empate de ambos os gêneros (primeiro as masculinas)
+    male_ties = male.index[male['classificacao_majoritaria'] == 'empate']
+    female_ties = female.index[female['classificacao_majoritaria'] == 'empate']
+    all_ties = male_ties.append(female_ties).unique()
     
-    # Cria DataFrame com informações detalhadas das frases removidas
-    removed_data = []
-    for frase in all_ties:
-        male_row = male_agg[male_agg['frase'] == frase].iloc[0] if len(male_agg[male_agg['frase'] == frase]) > 0 else None
-        female_row = female_agg[female_agg['frase'] == frase].iloc[0] if len(female_agg[female_agg['frase'] == frase]) > 0 else None
-        
-        removed_data.append({
-            'frase': frase,
-            'empate_masculino': 'Sim' if male_row is not None and male_row['classificacao_majoritaria'] == 'empate' else 'Não',
-            'empate_feminino': 'Sim' if female_row is not None and female_row['classificacao_majoritaria'] == 'empate' else 'Não',
-            'total_positiva_m': male_row['total_positiva'] if male_row is not None else 0,
-            'total_negativa_m': male_row['total_negativa'] if male_row is not None else 0,
-            'total_neutra_m': male_row['total_neutra'] if male_row is not None else 0,
-            'total_positiva_f': female_row['total_positiva'] if female_row is not None else 0,
-            'total_negativa_f': female_row['total_negativa'] if female_row is not None else 0,
-            'total_neutra_f': female_row['total_neutra'] if female_row is not None else 0
+    # Junção pelos ids empatados; frase ausente em um gênero conta como zero
+    male_rows = male.reindex(all_ties)
+    female_rows = female.reindex(all_ties)
+    removed = pd.DataFrame({
+        'id': all_ties,
+        'empate_masculino': np.where(male_rows['classificacao_majoritaria'] == 'empate', 'Sim', 'Não'),
+        'empate_feminino': np.where(female_rows['classificacao_majoritaria'] == 'empate', 'Sim', 'Não')
+    })
+    for rows, suffix in [(male_rows, '_m'), (female_rows, '_f')]:
+        for column in ['total_positiva', 'total_negativa', 'total_neutra']:
+            removed[column + suffix] = rows[column].fillna(0).astype('int64').to_numpy()
+    
+    return removed
+
+def file_hash(file: Path) -> str:
+    """Calcula o SHA-256 do conteúdo de um arquivo"""
+    digest = hashlib.sha256()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _render(df: pd.DataFrame) -> str:
+    """Serializa as linhas de um bloco como no arquivo consolidado (sem cabeçalho)"""
+    return df.to_csv(sep='\t', index=False, header=False)
+
+def _parse_block(file: Path, sentences: pd.DataFrame, parts: Tuple[str, ...]) -> Dict:
+    """Lê um bloco e produz as partes ``parts`` da entrada de cache correspondente"""
+    df = read_block(file)
+    df_male, df_female = split_by_gender(df)
+    parsed = {}
+    if 'resumo' in parts:
+        parsed.update({
+            'header': df.head(0).to_csv(sep='\t', index=False),
+            'registros': len(df),
+            'registros_m': len(df_male),
+            'registros_f': len(df_female),
+            'agregacao': df[AGGREGATION_COLUMNS].assign(id=sentence_ids(df['frase'], sentences))
         })
+    if 'linhas' in parts:
+        parsed['linhas'] = _render(df)
+    if 'genero' in parts:
+        parsed['linhas_m'] = _render(df_male)
+        parsed['linhas_f'] = _render(df_female)
+    if 'tabela' in parts:
+        parsed['tabela'] = df
+    return parsed
+
+def _cache_file(cache_dir: Path, digest: str, part: str) -> Path:
+    """Arquivo de uma parte da entrada de cache: Parquet para o bloco tipado, pickle para as demais"""
+    return cache_dir / (f'{digest}_{part}.parquet' if part == 'tabela' else f'{digest}_{part}.pkl')
+
+def _write_part(path: Path, part: Dict) -> None:
+    """Grava uma parte da entrada de cache no formato de _cache_file"""
+    if path.suffix == '.parquet':
+        part['tabela'].to_parquet(path, index=False)
+    else:
+        pd.to_pickle(part, path)
+
+def _read_part(path: Path) -> Dict:
+    """Lê uma parte gravada por _write_part"""
+    if path.suffix == '.parquet':
+        return {'tabela': pd.read_parquet(path)}
+    return pd.read_pickle(path)
+
+def load_blocks(paths: Paths, sentences: pd.DataFrame, rebuild: bool = False,
+                parts: Tuple[str, ...] = tuple(CACHE_PARTS)) -> List[Dict]:
+    """
+    Carrega os blocos pelo cache, relendo apenas os arquivos cujo hash mudou.
+
+    O manifesto associa cada bloco ao SHA-256 do seu conteúdo; as entradas de
+    cache são gravadas por hash, e as que não são mais referenciadas são apagadas.
+    Cada entrada é dividida nas partes de CACHE_PARTS, em arquivos separados, e
+    só as partes pedidas em ``parts`` são carregadas dos blocos inalterados ou
+    produzidas e gravadas para os alterados; um bloco inalterado ao qual falte
+    alguma das partes pedidas é relido.
+    Uma mudança na tabela de frases (ou em CACHE_VERSION) invalida todo o cache,
+    pois os dados de agregação são indexados pelo id das frases.
+    """
+    script_dir = Path(__file__).parent
+    cache_dir = script_dir / paths.cache_dir
+    manifest_path = script_dir / paths.manifest
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    sentences_digest = file_hash(script_dir / paths.sentences)
+    cached = {}
+    if manifest_path.exists() and not rebuild:
+        manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+        if manifest.get('frases') == sentences_digest and manifest.get('versao') == CACHE_VERSION:
+            cached = manifest.get('blocos', {})
+
+    new_manifest = {}
+    blocks = []
+    for file in list_block_files(paths):
+        digest = file_hash(file)
+        cache_files = {part: _cache_file(cache_dir, digest, part) for part in parts}
+        if cached.get(file.name) == digest and all(f.exists() for f in cache_files.values()):
+            block = {}
+            for part in parts:
+                block.update(_read_part(cache_files[part]))
+        else:
+            print(f"Processando bloco alterado: {file.name}")
+            block = _parse_block(file, sentences, parts)
+            for part in parts:
+                _write_part(cache_files[part], {key: block[key] for key in CACHE_PARTS[part]})
+        new_manifest[file.name] = digest
+        blocks.append(block)
+
+    manifest_path.write_text(
+        json.dumps({'versao': CACHE_VERSION, 'frases': sentences_digest, 'blocos': new_manifest}, indent=2),
+        encoding='utf-8'
+    )
+    live = {_cache_file(cache_dir, digest, part).name for digest in new_manifest.values() for part in CACHE_PARTS}
+    for stale in [*cache_dir.glob('*.pkl'), *cache_dir.glob('*.parquet')]:
+        if stale.name not in live:
+            stale.unlink()
+    return blocks
+
+def _write_rows(path: Path, header: str, rows: List[str]) -> None:
+    """Grava o cabeçalho seguido das linhas já serializadas de cada bloco"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(header)
+        f.writelines(rows)
+
+def write_gender_dumps(df: pd.DataFrame, paths: Paths, out_dir: Path) -> None:
+    """
+    Grava os registros de cada gênero a partir do consolidado; cada recorte só
+    existe durante a própria gravação
+    """
+    for genero, path in [('m', paths.male), ('f', paths.female)]:
+        write_output(df[df['GeneroCod'] == genero], out_dir / paths.output(path).name)
+
+def save_results(male_agg: pd.DataFrame, female_agg: pd.DataFrame, sentences: pd.DataFrame,
+                 paths: Paths, out_dir: Path) -> None:
+    """
+    Grava os agregados por gênero, as versões sem empate, os empates duplos e as
+    frases removidas em out_dir, com os nomes de arquivo definidos em paths
+    """
+    def save(df: pd.DataFrame, path: Path) -> None:
+        write_output(attach_text(df, sentences), out_dir / paths.output(path).name)
+
+    save(male_agg, paths.male_agg)
+    save(female_agg, paths.female_agg)
     
-    return pd.DataFrame(removed_data)
+    # Remove empates e salva novos arquivos
+    male_agg_no_ties = remove_ties(male_agg)
+    female_agg_no_ties = remove_ties(female_agg)
+    save(male_agg_no_ties, paths.male_agg_no_ties)
+    save(female_agg_no_ties, paths.female_agg_no_ties)
+    print(f"Frases sem empate - Masculino: {len(male_agg_no_ties)}")
+    print(f"Frases sem empate - Feminino: {len(female_agg_no_ties)}")
+    
+    # Análise de empates
+    empates_df = find_ties(male_agg, female_agg)
+    save(empates_df, paths.ties)
+    print(f"Total de frases com empate duplo: {len(empates_df)}")
+    
+    # Salva informações sobre frases removidas
+    removed_ties_df = get_removed_ties(male_agg, female_agg)
+    save(removed_ties_df, paths.removed_ties)
+    print(f"Total de frases removidas por empate: {len(removed_ties_df)}")
 
-def main():
-    """Função principal que executa todo o pipeline"""
-    paths = Paths()
+def main(rebuild: bool = False, output_format: str = 'csv', gender_dumps: bool = True):
+    """
+    Função principal que executa todo o pipeline (rebuild=True ignora o cache;
+    output_format='parquet' grava as saídas em Parquet; gender_dumps=False não
+    grava os registros brutos separados por gênero)
+    """
+    paths = Paths(output_format=output_format)
     script_dir = Path(__file__).parent
     
     # Cria o diretório base se não existir
@@ -149,41 +446,38 @@ def main():
         full_path.mkdir(parents=True, exist_ok=True)
     
     try:
-        # Consolidação
-        df_consolidated = consolidate_logs(paths)
-        df_consolidated.to_csv(script_dir / paths.consolidated, sep='\t', index=False)
-        print(f"Arquivo consolidado criado com {len(df_consolidated)} registros")
-        
-        # Separação por gênero
-        df_male, df_female = split_by_gender(df_consolidated)
-        df_male.to_csv(script_dir / paths.male, sep='\t', index=False)
-        df_female.to_csv(script_dir / paths.female, sep='\t', index=False)
-        print(f"Registros masculinos: {len(df_male)}")
-        print(f"Registros femininos: {len(df_female)}")
-        
-        # Agregação
-        male_agg = aggregate_data(df_male)
-        female_agg = aggregate_data(df_female)
-        male_agg.to_csv(script_dir / paths.male_agg, sep='\t', index=False)
-        female_agg.to_csv(script_dir / paths.female_agg, sep='\t', index=False)
-        
-        # Remove empates e salva novos arquivos
-        male_agg_no_ties = remove_ties(male_agg)
-        female_agg_no_ties = remove_ties(female_agg)
-        male_agg_no_ties.to_csv(script_dir / paths.male_agg_no_ties, sep='\t', index=False)
-        female_agg_no_ties.to_csv(script_dir / paths.female_agg_no_ties, sep='\t', index=False)
-        print(f"Frases sem empate - Masculino: {len(male_agg_no_ties)}")
-        print(f"Frases sem empate - Feminino: {len(female_agg_no_ties)}")
-        
-        # Análise de empates
-        empates_df = find_ties(male_agg, female_agg)
-        empates_df.to_csv(script_dir / paths.ties, sep='\t', index=False)
-        print(f"Total de frases com empate duplo: {len(empates_df)}")
+        # Consolidação e separação por gênero: apenas blocos novos ou alterados são lidos
+        sentences = load_sentences(paths)
+        parts = ['resumo']
+        if paths.output_format == 'csv':
+            parts.append('linhas')
+            if gender_dumps:
+                parts.append('genero')
+        else:
+            parts.append('tabela')
+        blocks = load_blocks(paths, sentences, rebuild=rebuild, parts=tuple(parts))
+        if paths.output_format == 'csv':
+            # Em CSV, as linhas de cada bloco já estão serializadas no cache
+            header = blocks[0]['header']
+            _write_rows(script_dir / paths.consolidated, header, [b['linhas'] for b in blocks])
+            if gender_dumps:
+                _write_rows(script_dir / paths.male, header, [b['linhas_m'] for b in blocks])
+                _write_rows(script_dir / paths.female, header, [b['linhas_f'] for b in blocks])
+        else:
+            # Em Parquet, o consolidado tipado é a concatenação dos blocos tipados do cache
+            df = pd.concat([b['tabela'] for b in blocks], ignore_index=True)
+            write_output(df, script_dir / paths.output(paths.consolidated))
+            if gender_dumps:
+                write_gender_dumps(df, paths, script_dir / paths.base_dir)
+        print(f"Arquivo consolidado criado com {sum(b['registros'] for b in blocks)} registros")
+        print(f"Registros masculinos: {sum(b['registros_m'] for b in blocks)}")
+        print(f"Registros femininos: {sum(b['registros_f'] for b in blocks)}")
         
-        # Salva informações sobre frases removidas
-        removed_ties_df = get_removed_ties(male_agg, female_agg)
-        removed_ties_df.to_csv(script_dir / paths.removed_ties, sep='\t', index=False)
-        print(f"Total de frases removidas por empate: {len(removed_ties_df)}")
+        # Agregação pelo id das frases sobre as colunas guardadas de cada bloco,
+        # com o mesmo groupby do consolidado completo; o texto só é anexado na gravação
+        male_agg, female_agg = aggregate_by_gender(
+            pd.concat([b['agregacao'] for b in blocks], ignore_index=True))
+        save_results(male_agg, female_agg, sentences, paths, script_dir / paths.base_dir)
         
     except FileNotFoundError as e:
         print(f"Erro: {e}")
@@ -191,4 +485,8 @@ def main():
         print(f"Erro inesperado: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(
+        rebuild='--rebuild' in sys.argv[1:],
+        output_format='parquet' if '--parquet' in sys.argv[1:] else 'csv',
+        gender_dumps='--sem-dumps-genero' not in sys.argv[1:]
+    )
\ No newline at end of file
@@ -0,0 +1,100 @@
+"""
+Executa o pipeline completo a partir dos logs brutos do PCIbex, sem os notebooks.
+
+Os blocos (etapa de "02. concatena_frases.ipynb") são montados em paralelo e
+passam direto, em memória, para a consolidação e a agregação de log_processor,
+sem gravar e reler os bloco_N_concatenado.csv e o arquivo consolidado.
+
+Uso:
+    python processa_logs_brutos.py [pasta_logs_brutos] [--frases ARQUIVO]
+                                   [--saida PASTA] [--workers N] [--blocos]
+                                   [--sem-dumps-genero] [--formato {csv,parquet}]
+"""
+import argparse
+import csv
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Tuple
+
+import pandas as pd
+
+from concatena_frases import listar_logs_brutos, processar_arquivo_log
+from log_processor import (
+    Paths,
+    aggregate_by_gender,
+    consolidate_frames,
+    load_sentences,
+    save_results,
+    write_gender_dumps,
+    write_output
+)
+
+BLOCK_COLUMNS = ['ParticipantMD5', 'GeneroCod', 'frase', 'Value', 'duracao']
+
+def _processar_bloco(args: Tuple[int, Path, pd.DataFrame]) -> pd.DataFrame:
+    num_bloco, arquivo, frases_bloco = args
+    return processar_arquivo_log(str(arquivo), frases_bloco, num_bloco)
+
+def build_blocks(raw_dir: Path, sentences: pd.DataFrame, max_workers: int = None) -> List[Tuple[int, pd.DataFrame]]:
+    """Monta os blocos de todos os logs brutos da pasta em paralelo; retorna (número do bloco, bloco)"""
+    logs = listar_logs_brutos(raw_dir)
+    if not logs:
+        raise FileNotFoundError(f"Nenhum arquivo results_prod*.csv encontrado em {raw_dir}")
+
+    frases = sentences.reset_index(drop=True)
+    tarefas = [(num_bloco, arquivo, frases[frases['bloco'] == num_bloco])
+               for num_bloco, arquivo in logs]
+    if max_workers == 1:
+        blocks = [_processar_bloco(tarefa) for tarefa in tarefas]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            blocks = list(executor.map(_processar_bloco, tarefas))
+    return [(num_bloco, block) for (num_bloco, _), block in zip(logs, blocks)]
+
+def main():
+    script_dir = Path(__file__).parent
+    paths = Paths()
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('logs_brutos', nargs='?', type=Path, default=script_dir / 'logs_brutos',
+                        help='pasta com os results_prod*.csv')
+    parser.add_argument('--frases', type=Path, default=script_dir / paths.sentences,
+                        help='tabela de frases com os blocos (MQD_1465_blocos_randomizados.csv)')
+    parser.add_argument('--saida', type=Path, default=script_dir / paths.base_dir,
+                        help='pasta dos arquivos gerados')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processos usados para montar os blocos (1 = sequencial)')
+    parser.add_argument('--blocos', action='store_true',
+                        help='também grava os bloco_N_concatenado.csv')
+    parser.add_argument('--sem-dumps-genero', action='store_true',
+                        help='não grava os registros brutos separados por gênero')
+    parser.add_argument('--formato', choices=['csv', 'parquet'], default='csv',
+                        help='formato dos arquivos de saída')
+    args = parser.parse_args()
+    paths = Paths(output_format=args.formato)
+
+    # Caminho absoluto: Path(__file__).parent / frases continua apontando para ele
+    sentences = load_sentences(Paths(sentences=args.frases.resolve()))
+    args.saida.mkdir(parents=True, exist_ok=True)
+
+    blocks = build_blocks(args.logs_brutos, sentences, args.workers)
+    if args.blocos:
+        for num_bloco, block in blocks:
+            block.to_csv(args.saida / f'bloco_{num_bloco}_concatenado.csv', sep='\t', index=False,
+                         quoting=csv.QUOTE_ALL, quotechar='"', encoding='utf-8')
+
+    # Consolidação em memória; os gêneros são separados só na agregação e nos dumps
+    df = consolidate_frames([block for _, block in blocks], sentences)
+    write_output(df[BLOCK_COLUMNS], args.saida / paths.output(paths.consolidated).name)
+    if not args.sem_dumps_genero:
+        write_gender_dumps(df[BLOCK_COLUMNS], paths, args.saida)
+    generos = df['GeneroCod'].value_counts()
+    print(f"Arquivo consolidado criado com {len(df)} registros")
+    print(f"Registros masculinos: {generos.get('m', 0)}")
+    print(f"Registros femininos: {generos.get('f', 0)}")
+
+    male_agg, female_agg = aggregate_by_gender(df)
+    save_results(male_agg, female_agg, sentences, paths, args.saida)
+
+if __name__ == "__main__":
+    main()